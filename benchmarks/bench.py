@@ -0,0 +1,232 @@
+'''
+Benchmarks of dalymi's scheduling overhead and resource I/O throughput.
+
+The scheduler suite builds synthetic DAGs (chains, fan-outs and diamonds of up to 10k tasks) and measures the time to
+register their tasks, to run them (cold) and to check them once all outputs exist (warm, for the entire DAG and for
+the last task only). Tasks are no-ops handing over small objects in memory, or I/O-heavy tasks saving and loading
+pickled payloads. The I/O suite measures save and load throughput of `PandasCSV` and `Pickle` resources over a range
+of data frame sizes.
+
+Results are written as JSON, e.g. to compare versions:
+
+    python benchmarks/bench.py --output before.json
+    git checkout <other version>
+    python benchmarks/bench.py --output after.json --compare before.json
+'''
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from dalymi import Pipeline  # noqa: E402
+from dalymi.resources import PandasCSV, Pickle, Resource  # noqa: E402
+
+
+SHAPES = ('chain', 'fanout', 'diamond')
+TASK_COUNTS = (10, 100, 1000, 10000)
+IO_TASK_COUNTS = (10, 100, 1000)
+ROW_COUNTS = (10**3, 10**4, 10**5, 10**6)
+
+
+class Memory(Resource):
+    '''
+    A resource kept in a dictionary, so that benchmarks of no-op tasks measure the overhead of dalymi only.
+    '''
+
+    def __init__(self, name, store):
+        Resource.__init__(self, name=name, loc=name)
+        self.store = store
+
+    def check(self, path):
+        return path in self.store
+
+    def delete(self, path):
+        self.store.pop(path, None)
+
+    def load(self, path):
+        return self.store[path]
+
+    def save(self, path, data):
+        self.store[path] = data
+
+
+def make_task(name, payload):
+    '''
+    Returns a task function named `name` (ignoring its inputs) returning `payload`.
+    '''
+    def task(**context):
+        return payload
+    task.__name__ = name
+    return task
+
+
+def build(shape, n, kind, directory, payload_size):
+    '''
+    Returns a pipeline of `n` tasks in the given `shape` and the name of its last task. Tasks of `kind` `'noop'`
+    hand over a small integer in memory, those of kind `'io'` save and load a pickled payload of `payload_size`
+    bytes in `directory`.
+    '''
+    pl = Pipeline()
+    store = {}
+    payload = os.urandom(payload_size) if kind == 'io' else 0
+
+    def resource(i):
+        name = 'r{}'.format(i)
+        if kind == 'io':
+            return Pickle(name=name, loc=os.path.join(directory, name + '.pkl'))
+        return Memory(name, store)
+
+    resources = [resource(i) for i in range(n)]
+    for i in range(n):
+        if shape == 'chain':
+            inputs = [resources[i - 1]] if i else []
+        elif shape == 'fanout':
+            inputs = [resources[0]] if i else []
+        elif i == 0:
+            inputs = []
+        elif i < n - 1 or n < 3:
+            inputs = [resources[0]]
+        else:
+            inputs = resources[1:n - 1]  # the sink of the diamond consumes all intermediate outputs
+        task = make_task('t{}'.format(i), payload)
+        if inputs:
+            task = pl.input(*inputs)(task)
+        pl.output(resources[i])(task)
+    return pl, 't{}'.format(n - 1)
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def bench_scheduler(shapes, counts, io_counts, workers, payload_size):
+    results = []
+    for kind, task_counts in [('noop', counts), ('io', io_counts)]:
+        for shape in shapes:
+            for n in task_counts:
+                with tempfile.TemporaryDirectory() as directory:
+                    started = time.perf_counter()
+                    pl, last = build(shape, n, kind, directory, payload_size)
+                    register = time.perf_counter() - started
+                    cold = timed(pl.run, workers=workers)
+                    warm = timed(pl.run, workers=workers)
+                    warm_task = timed(pl.run, task=last, workers=workers)
+                result = {'suite': 'scheduler', 'shape': shape, 'tasks': n, 'kind': kind, 'workers': workers,
+                          'register_s': register, 'run_cold_s': cold, 'run_warm_s': warm,
+                          'run_warm_task_s': warm_task, 'overhead_per_task_us': cold / n * 1e6,
+                          'check_per_task_us': warm / n * 1e6}
+                if kind == 'io':
+                    result['payload_bytes'] = payload_size
+                print('{shape:>8} {kind:>5} {tasks:>6} tasks: register {register_s:8.3f}s, '
+                      'cold run {run_cold_s:8.3f}s ({overhead_per_task_us:9.1f}us/task), warm run {run_warm_s:8.3f}s, '
+                      'warm task {run_warm_task_s:8.3f}s'.format(**result))
+                results.append(result)
+    return results
+
+
+def frame(rows):
+    import numpy as np
+    import pandas as pd
+    random = np.random.RandomState(0)
+    return pd.DataFrame({'a': random.randint(0, 10**6, rows), 'b': random.rand(rows), 'c': random.rand(rows),
+                         'd': np.arange(rows), 'e': random.choice(['red', 'green', 'blue'], rows)})
+
+
+def bench_io(row_counts, repeat):
+    results = []
+    for resource_class, extension in [(PandasCSV, 'csv'), (Pickle, 'pkl')]:
+        for rows in row_counts:
+            df = frame(rows)
+            with tempfile.TemporaryDirectory() as directory:
+                resource = resource_class(name='df', loc=os.path.join(directory, 'df.' + extension))
+                save = min(timed(resource._save, df, {}) for _ in range(repeat))
+                load = min(timed(resource._load, {}) for _ in range(repeat))
+                size = resource._size({})
+            result = {'suite': 'io', 'resource': resource_class.__name__, 'rows': rows, 'bytes': size,
+                      'save_s': save, 'load_s': load, 'save_mb_per_s': size / save / 2**20,
+                      'load_mb_per_s': size / load / 2**20, 'save_rows_per_s': rows / save,
+                      'load_rows_per_s': rows / load}
+            print('{resource:>10} {rows:>8} rows ({bytes:>11} bytes): save {save_mb_per_s:8.1f} MB/s, '
+                  'load {load_mb_per_s:8.1f} MB/s'.format(**result))
+            results.append(result)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                         cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpus': os.cpu_count(),
+            'timestamp': datetime.datetime.now().isoformat()}
+
+
+def key(result):
+    return tuple((_, result[_]) for _ in ['suite', 'shape', 'kind', 'tasks', 'workers', 'resource', 'rows']
+                 if _ in result)
+
+
+def compare(results, baseline):
+    '''
+    Prints the ratios of timings of `results` and `baseline` (below 1 means faster).
+    '''
+    previous = {key(_): _ for _ in baseline['results']}
+    print('\nCompared to {} (ratios, < 1 is faster):'.format(baseline['environment'].get('commit')))
+    for result in results:
+        other = previous.get(key(result))
+        if other is None:
+            continue
+        ratios = ['{} {:.2f}'.format(name, result[name] / other[name]) for name in sorted(result)
+                  if name.endswith('_s') and other.get(name)]
+        print('  {}: {}'.format(', '.join('{}={}'.format(*_) for _ in key(result)[1:]), ', '.join(ratios)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark scheduling overhead and resource I/O throughput')
+    parser.add_argument('--suite', choices=['scheduler', 'io', 'all'], default='all')
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=list(SHAPES))
+    parser.add_argument('--tasks', nargs='+', type=int, default=list(TASK_COUNTS),
+                        help='numbers of no-op tasks (default: %(default)s)')
+    parser.add_argument('--io-tasks', nargs='+', type=int, default=list(IO_TASK_COUNTS),
+                        help='numbers of I/O-heavy tasks (default: %(default)s)')
+    parser.add_argument('--payload', type=int, default=2**16, help='bytes saved by each I/O-heavy task')
+    parser.add_argument('--rows', nargs='+', type=int, default=list(ROW_COUNTS),
+                        help='data frame sizes of the I/O suite (default: %(default)s)')
+    parser.add_argument('-w', '--workers', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions of I/O measurements (best is reported)')
+    parser.add_argument('--log', action='store_true', help='enable dalymi\'s INFO logging (to a null handler)')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='the JSON file to write results to')
+    parser.add_argument('--compare', metavar='BASELINE', help='a JSON file of previous results to compare to')
+    args = parser.parse_args(argv)
+    if args.log:
+        logger = logging.getLogger('dalymi')
+        logger.setLevel(logging.INFO)
+        logger.addHandler(logging.NullHandler())
+        logger.propagate = False
+    results = []
+    if args.suite in ('scheduler', 'all'):
+        results += bench_scheduler(args.shapes, args.tasks, args.io_tasks, args.workers, args.payload)
+    if args.suite in ('io', 'all'):
+        results += bench_io(args.rows, args.repeat)
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'arguments': vars(args), 'results': results}, f, indent=2)
+    print('Wrote results to {}.'.format(args.output))
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+'''
+A thin client submitting commands to a pipeline served with `python pipeline.py serve`, e.g.
+`python -m dalymi --socket dalymi.sock run -t train`.
+'''
+import argparse
+import sys
+
+from .server import DEFAULT_SOCKET, submit
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dalymi',
+                                     description='submit a command to a served pipeline and stream back its logs')
+    parser.add_argument('-s', '--socket', default=DEFAULT_SOCKET,
+                        help='the socket the pipeline is served on (default: {})'.format(DEFAULT_SOCKET))
+    parser.add_argument('command', nargs=argparse.REMAINDER, help='the pipeline command, e.g. run -t train')
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.error('a command is required, e.g. run, undo or ls')
+    try:
+        return submit(args.command, args.socket)
+    except (ConnectionRefusedError, FileNotFoundError):
+        parser.exit(1, 'No pipeline is served on {}.\n'.format(args.socket))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
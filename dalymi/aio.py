@@ -0,0 +1,122 @@
+import asyncio
+from concurrent import futures
+import threading
+
+
+# The number of threads running synchronous resource I/O of an `IOLoop`:
+IO_THREADS = 16
+
+_inline = threading.local()  # `active`: whether the calling thread runs coroutines inline (see `run_inline`)
+
+
+class _Done:
+    '''
+    An awaitable of the result of a call which finished already.
+    '''
+    __slots__ = ('result',)
+
+    def __init__(self, result):
+        self.result = result
+
+    def __await__(self):
+        return self.result
+        yield  # makes `__await__` a generator
+
+
+def offload(func, *args):
+    '''
+    Runs the synchronous `func(*args)` in the default executor of the running event loop and returns an awaitable of
+    its result. Within `run_inline`, `func` runs right away in the calling thread.
+    '''
+    if getattr(_inline, 'active', False):
+        return _Done(func(*args))
+    return asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+
+def run_inline(coroutines):
+    '''
+    Runs `coroutines` one after the other in the calling thread, without an event loop, and returns the list of their
+    results. This avoids handing work to other threads where there is nothing to run concurrently. The coroutines
+    must not await anything but `offload` (as the default asynchronous methods of resources do).
+    '''
+    coroutines = list(coroutines)
+    results = []
+    active, _inline.active = getattr(_inline, 'active', False), True
+    try:
+        for coroutine in coroutines:
+            try:
+                coroutine.send(None)
+            except StopIteration as e:
+                results.append(e.value)
+            else:
+                raise RuntimeError('Coroutine {} awaited more than offloaded calls.'.format(coroutine.__qualname__))
+    finally:
+        _inline.active = active
+        for coroutine in coroutines:
+            coroutine.close()
+    return results
+
+
+async def _gather(coroutines):
+    return await asyncio.gather(*coroutines)
+
+
+def gather(coroutines):
+    '''
+    Runs `coroutines` concurrently on a temporary event loop and returns the list of their results.
+    '''
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_gather(coroutines))
+    finally:
+        loop.close()
+
+
+class IOLoop:
+    '''
+    An `asyncio` event loop running in a background thread, through which synchronous code (e.g. tasks running in
+    worker threads) runs resource I/O concurrently. Synchronous resource methods are offloaded to a pool of
+    `threads` threads.
+    '''
+
+    def __init__(self, threads=IO_THREADS):
+        self._executor = futures.ThreadPoolExecutor(max_workers=threads)
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._executor)
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def submit(self, coroutine):
+        '''
+        Schedules `coroutine` on the loop and returns a `concurrent.futures.Future` of its result.
+        '''
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def gather(self, coroutines):
+        '''
+        Runs `coroutines` concurrently on the loop, blocks until all finished and returns the list of their results.
+        Must not be called from the loop's thread.
+        '''
+        return self.submit(_gather(coroutines)).result()
+
+    def close(self):
+        '''
+        Waits for all scheduled coroutines, stops the loop and shuts down its threads.
+        '''
+        self.submit(_drain()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._executor.shutdown(wait=True)
+
+
+async def _drain():
+    '''
+    Waits for all other tasks of the running event loop.
+    '''
+    all_tasks = getattr(asyncio, 'all_tasks', None) or asyncio.Task.all_tasks  # Python < 3.7
+    current_task = getattr(asyncio, 'current_task', None) or asyncio.Task.current_task
+    current = current_task()
+    tasks = [_ for _ in all_tasks() if _ is not current and not _.done()]
+    if tasks:
+        await asyncio.wait(tasks)
@@ -0,0 +1,92 @@
+'''
+Helpers to declare resource assertions (see `Resource.assertions`).
+
+Assertions passing when an output is saved are recorded in its metadata, together with its stamps. Subsequent loads of
+the unchanged file skip them, depending on the assertion policy of the run (see `Pipeline.run`). Assertions marked as
+`cheap` still run on each load by default.
+'''
+
+
+# How recorded assertion results are used when loading resources:
+#   'strict': run all assertions on each load
+#   'cheap': only run cheap assertions if the others passed for the unchanged content already
+#   'recorded': skip all assertions which passed for the unchanged content already
+ASSERTION_POLICIES = ('strict', 'cheap', 'recorded')
+
+
+def cheap(assertion):
+    '''
+    Marks `assertion` as cheap (e.g. checking only the schema of data), so that it runs on each load unless the
+    assertion policy is `'recorded'`. Can be used as decorator.
+    '''
+    assertion.cheap = True
+    return assertion
+
+
+def is_cheap(assertion):
+    return getattr(assertion, 'cheap', False)
+
+
+def label(assertion):
+    '''
+    Returns the name under which results of `assertion` are recorded, or `None` for anonymous functions (lambdas),
+    whose results are not recorded.
+    '''
+    qualname = getattr(assertion, '__qualname__', None)
+    if qualname is None or '<lambda>' in qualname:
+        return None
+    return '{}.{}'.format(getattr(assertion, '__module__', None), qualname)
+
+
+def sampled(assertion, n=10000, seed=0):
+    '''
+    Returns an assertion running `assertion` on a random sample of `n` rows of large data frames or arrays (and on
+    smaller data as a whole). The sample is reproducible for a given `seed`.
+    '''
+    def sampled_assertion(data):
+        if len(data) <= n:
+            return assertion(data)
+        if hasattr(data, 'sample'):
+            return assertion(data.sample(n=n, random_state=seed))
+        import numpy as np  # importing numpy here to avoid general dependency on it
+        rows = np.random.RandomState(seed).choice(len(data), size=n, replace=False)
+        return assertion(data[np.sort(rows)])
+
+    sampled_assertion.__module__ = getattr(assertion, '__module__', None)
+    sampled_assertion.__qualname__ = 'sampled({}, n={}, seed={})'.format(
+        getattr(assertion, '__qualname__', '<lambda>'), n, seed)
+    sampled_assertion.cheap = is_cheap(assertion)
+    return sampled_assertion
+
+
+def none_null(df):
+    '''
+    Asserts that a data frame does not contain any nulls. Vectorized, i.e. scans the data only once.
+    '''
+    assert not df.isnull().values.any(), 'Data frame contains nulls.'
+
+
+def unique(*columns):
+    '''
+    Returns an assertion that the combinations of values in `columns` of a data frame are unique.
+    '''
+    def unique_assertion(df):
+        duplicated = df.duplicated(subset=list(columns)).values.any()
+        assert not duplicated, 'Data frame contains duplicate values of {}.'.format(list(columns))
+
+    unique_assertion.__qualname__ = 'unique({})'.format(', '.join(repr(_) for _ in columns))
+    return unique_assertion
+
+
+def between(column, low=None, high=None):
+    '''
+    Returns an assertion that all values of `column` of a data frame lie within `[low, high]` (bounds of `None`
+    are ignored).
+    '''
+    def between_assertion(df):
+        values = df[column].values
+        assert low is None or not (values < low).any(), 'Column {} contains values below {}.'.format(column, low)
+        assert high is None or not (values > high).any(), 'Column {} contains values above {}.'.format(column, high)
+
+    between_assertion.__qualname__ = 'between({!r}, low={!r}, high={!r})'.format(column, low, high)
+    return between_assertion
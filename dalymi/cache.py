@@ -0,0 +1,173 @@
+from collections import OrderedDict
+import copy
+import sys
+import threading
+
+
+def sizeof(data):
+    '''
+    Estimates the memory footprint of `data` in bytes. Uses `memory_usage` of `pandas` objects and `nbytes` of `numpy`
+    arrays, if available, and falls back to `sys.getsizeof`.
+    '''
+    if hasattr(data, 'memory_usage'):
+        try:
+            usage = data.memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+        except TypeError:
+            pass
+    if hasattr(data, 'nbytes'):
+        return int(data.nbytes)
+    return sys.getsizeof(data)
+
+
+class ObjectCache:
+    '''
+    A thread-safe, run-scoped cache handing task results directly to consumers within the same run.
+
+    Entries are keyed by resource name and formatted location. Each entry counts the consumers which still need it
+    and is dropped as soon as the last one took it. Every consumer but the last one receives a copy, so that tasks
+    changing their inputs in place do not change what other consumers receive. If the memory budget is exceeded, least
+    recently used entries are evicted (consumers then fall back to loading the resource).
+
+    # Arguments
+    budget (int): the maximum estimated size of all cached objects in bytes
+    '''
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self._entries = OrderedDict()  # keys: (resource name, path), values: [data, size, pending consumers]
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def put(self, key, data, pending):
+        '''
+        Caches `data` for `pending` consumers. Objects larger than the entire budget are not cached.
+        '''
+        if pending < 1:
+            return
+        size = sizeof(data)
+        if size > self.budget:
+            return
+        with self._lock:
+            self._pop(key)
+            while self._entries and self.size + size > self.budget:
+                self._pop(next(iter(self._entries)))
+            self._entries[key] = [data, size, pending]
+            self.size += size
+
+    def take(self, key):
+        '''
+        Returns the cached object for `key` on behalf of one consumer (a copy, unless it is the last consumer).
+        Raises `KeyError` if `key` is not cached.
+        '''
+        with self._lock:
+            entry = self._entries[key]
+            self._entries.move_to_end(key)
+            self._release(key, entry)
+            if key in self._entries:
+                entry[2] += 1  # keeps the entry until the copy is made outside of the lock
+                last = False
+            else:
+                last = True
+        if last:
+            return entry[0]
+        try:
+            return copy.deepcopy(entry[0])
+        finally:
+            self.release(key)
+
+    def release(self, key):
+        '''
+        Signals that one consumer does not need the object for `key` anymore (e.g. because it was skipped).
+        '''
+        with self._lock:
+            if key in self._entries:
+                self._release(key, self._entries[key])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _release(self, key, entry):
+        entry[2] -= 1
+        if entry[2] < 1:
+            self._pop(key)
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+class WarmCache:
+    '''
+    A thread-safe cache of loaded and saved resources, kept across runs by a long-lived process (see `dalymi.server`).
+
+    Entries are keyed by resource name and formatted location and are only valid as long as the stamp of the resource
+    (e.g. modification time and size of a local file) is unchanged. If the memory budget is exceeded, least recently
+    used entries are evicted. Objects are copied when they are cached and when they are handed out, so that tasks
+    changing their inputs in place do not change what later runs receive.
+
+    # Arguments
+    budget (int): the maximum estimated size of all cached objects in bytes
+    '''
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self._entries = OrderedDict()  # keys: (resource name, path), values: [data, size, stamp]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def put(self, key, stamp, data):
+        '''
+        Caches `data` of the resource state identified by `stamp`. Objects larger than the entire budget are not
+        cached.
+        '''
+        size = sizeof(data)
+        if size > self.budget:
+            with self._lock:
+                self._pop(key)
+            return
+        data = copy.deepcopy(data)
+        with self._lock:
+            self._pop(key)
+            while self._entries and self.size + size > self.budget:
+                self._pop(next(iter(self._entries)))
+            self._entries[key] = [data, size, stamp]
+            self.size += size
+
+    def get(self, key, stamp):
+        '''
+        Returns a copy of the cached object for `key` if it was cached with `stamp`. Raises `KeyError` otherwise.
+        '''
+        with self._lock:
+            entry = self._entries[key]
+            if entry[2] != stamp:
+                self._pop(key)
+                raise KeyError(key)
+            self._entries.move_to_end(key)
+            data = entry[0]
+        return copy.deepcopy(data)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
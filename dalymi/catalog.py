@@ -0,0 +1,113 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS resources (
+    path TEXT PRIMARY KEY,
+    resource TEXT NOT NULL,
+    task TEXT,
+    context TEXT,
+    size INTEGER,
+    stamp TEXT,
+    created REAL,
+    accessed REAL,
+    duration REAL,
+    fingerprint TEXT,
+    mode TEXT
+);
+CREATE INDEX IF NOT EXISTS resources_resource ON resources (resource);
+CREATE INDEX IF NOT EXISTS resources_task ON resources (task);
+'''
+
+COLUMNS = ('path', 'resource', 'task', 'context', 'size', 'stamp', 'created', 'accessed', 'duration', 'fingerprint',
+           'mode')
+
+
+class Catalog:
+    '''
+    A local SQLite database recording materialized resources: their formatted location, name, producing task, the
+    context values they were produced with, size, stamp (modification time and size or content hash), time of
+    creation and last access, the duration of the producing task and the fingerprint of the resource. `mode` is the
+    fingerprint mode the stamp and fingerprint were recorded with.
+
+    The catalog is safe to use from several threads and processes.
+
+    # Arguments
+    path (str): the location of the database file
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(SCHEMA)
+        existing = {_[1] for _ in self._connection.execute('PRAGMA table_info(resources)')}
+        for column in COLUMNS[len(existing):]:  # databases created by older versions
+            self._connection.execute('ALTER TABLE resources ADD COLUMN {} TEXT'.format(column))
+
+    def _execute(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def record(self, path, resource, task=None, context=None, size=None, stamp=None, duration=None, fingerprint=None,
+               mode=None):
+        '''
+        Records (or replaces) the materialized resource at `path`.
+        '''
+        now = time.time()
+        context = json.dumps(context, sort_keys=True, default=str) if context is not None else None
+        self._execute('INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                      (path, resource, task, context, size, stamp, now, now, duration, fingerprint, mode))
+
+    def forget(self, path):
+        '''
+        Removes the record of the resource at `path`.
+        '''
+        self._execute('DELETE FROM resources WHERE path = ?', (path,))
+
+    def touch(self, path):
+        '''
+        Updates the time of last access of the resource at `path`.
+        '''
+        self._execute('UPDATE resources SET accessed = ? WHERE path = ?', (time.time(), path))
+
+    def exists(self, path):
+        '''
+        Returns whether a resource at `path` is recorded.
+        '''
+        return bool(self._execute('SELECT 1 FROM resources WHERE path = ?', (path,)))
+
+    def get(self, path):
+        '''
+        Returns the record of the resource at `path` as dictionary (or `None`).
+        '''
+        rows = self._execute('SELECT * FROM resources WHERE path = ?', (path,))
+        return self._entry(rows[0]) if rows else None
+
+    def entries(self, resource=None, task=None):
+        '''
+        Returns the records (optionally only of a resource name or task) as list of dictionaries, ordered by path.
+        '''
+        conditions = [(column, value) for column, value in [('resource', resource), ('task', task)] if value]
+        sql = 'SELECT * FROM resources'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join('{} = ?'.format(column) for column, _ in conditions)
+        rows = self._execute(sql + ' ORDER BY path', [value for _, value in conditions])
+        return [self._entry(_) for _ in rows]
+
+    def _entry(self, row):
+        entry = dict(zip(COLUMNS, row))
+        entry['context'] = json.loads(entry['context']) if entry['context'] else {}
+        return entry
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
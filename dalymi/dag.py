@@ -0,0 +1,120 @@
+from collections import deque
+
+
+class CycleError(ValueError):
+    '''
+    Raised if registering a task would make the pipeline graph cyclic.
+    '''
+    pass
+
+
+class DAG:
+    '''
+    Adjacency indexes of a pipeline graph, maintained while tasks register. Tasks and resources are referred to by
+    name. All graph queries run in O(V+E) of the visited part of the graph.
+
+    # Attributes
+    inputs (dict): keys: task names, values: lists of input resource names
+    outputs (dict): keys: task names, values: lists of output resource names
+    consumers (dict): keys: resource names, values: lists of consuming task names
+    producers (dict): keys: resource names, values: producing task names
+    tasks (list): task names in order of registration
+    '''
+
+    def __init__(self):
+        self.inputs = {}
+        self.outputs = {}
+        self.consumers = {}
+        self.producers = {}
+        self.tasks = []
+        self._positions = {}  # keys: task names, values: index in `tasks`
+
+    def _register(self, task):
+        if task not in self.inputs:
+            self.inputs[task] = []
+            self.outputs[task] = []
+            self._positions[task] = len(self.tasks)
+            self.tasks.append(task)
+
+    def add_inputs(self, task, resources):
+        '''
+        Registers the resource names in `resources` as inputs of `task`.
+        '''
+        self._register(task)
+        for resource in resources:
+            if resource not in self.inputs[task]:
+                self.inputs[task].append(resource)
+                self.consumers.setdefault(resource, []).append(task)
+        self._check_cycle(task)
+
+    def add_outputs(self, task, resources):
+        '''
+        Registers `task` as the producer of the resource names in `resources`.
+        '''
+        self._register(task)
+        for resource in resources:
+            if resource not in self.outputs[task]:
+                self.outputs[task].append(resource)
+            self.producers[resource] = task
+        self._check_cycle(task)
+
+    def _check_cycle(self, task):
+        if task in self.downstream(task):
+            msg = 'Task <{}> depends on its own output. '.format(task)
+            msg += 'Tasks and resources must form a directed acyclic graph.'
+            raise CycleError(msg)
+
+    def parents(self, task):
+        '''
+        Returns the names of tasks producing inputs of `task`.
+        '''
+        return {self.producers[_] for _ in self.inputs.get(task, []) if _ in self.producers}
+
+    def children(self, task):
+        '''
+        Returns the names of tasks consuming outputs of `task`.
+        '''
+        return {child for _ in self.outputs.get(task, []) for child in self.consumers.get(_, [])}
+
+    def upstream(self, task):
+        '''
+        Returns the names of all tasks which `task` (directly or indirectly) depends on.
+        '''
+        return self._traverse(task, self.parents)
+
+    def downstream(self, task):
+        '''
+        Returns the names of all tasks which (directly or indirectly) depend on `task`.
+        '''
+        return self._traverse(task, self.children)
+
+    def _traverse(self, task, neighbours):
+        visited = set()
+        stack = list(neighbours(task))
+        while stack:
+            current = stack.pop()
+            if current not in visited:
+                visited.add(current)
+                stack.extend(neighbours(current) - visited)
+        return visited
+
+    def topological_sort(self, tasks=None):
+        '''
+        Returns `tasks` (default: all tasks) sorted such that every task comes after its producers. Ties are broken
+        by order of registration.
+        '''
+        selected = set(self.tasks if tasks is None else tasks)
+        tasks = sorted(selected, key=self._positions.__getitem__)
+        waiting = {_: len(self.parents(_) & selected) for _ in tasks}
+        ready = deque(_ for _ in tasks if waiting[_] == 0)
+        order = []
+        while ready:
+            task = ready.popleft()
+            order.append(task)
+            for child in sorted(self.children(task) & selected, key=self._positions.__getitem__):
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    ready.append(child)
+        if len(order) < len(tasks):
+            raise CycleError('Tasks {} form a cycle.'.format([_ for _ in tasks if waiting[_] > 0]))
+        return order
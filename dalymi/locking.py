@@ -0,0 +1,125 @@
+import errno
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+
+class TaskLock:
+    '''
+    An exclusive claim on a task, shared by all processes (and machines) with access to the same file system.
+
+    The lock is held by atomically creating a lock file. While the lock is held, a background thread refreshes the
+    modification time of the file (heartbeat). A lock whose heartbeat stopped for longer than `timeout` seconds, or
+    whose owner process on the same machine died, is stale and can be broken by other workers.
+
+    # Arguments
+    path (str): the location of the lock file
+    timeout (float): seconds without heartbeat after which the lock counts as stale
+    heartbeat (float): seconds between heartbeats
+    '''
+
+    def __init__(self, path, timeout=60., heartbeat=5.):
+        self.path = path
+        self.timeout = timeout
+        self.heartbeat = heartbeat
+        self.token = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self):
+        '''
+        Tries to acquire the lock (breaking it if it is stale). Returns whether the lock was acquired.
+        '''
+        for attempt in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if attempt == 0 and self.is_stale():
+                    self._break()
+                    continue
+                return False
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'host': socket.gethostname(), 'pid': os.getpid(), 'token': self.token}, f)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._beat, daemon=True)
+            self._thread.start()
+            return True
+        return False
+
+    def release(self):
+        '''
+        Releases the lock if it is (still) held by this object.
+        '''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.owner(self.path).get('token') == self.token:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def wait(self, poll=0.1, max_poll=5.):
+        '''
+        Blocks until the lock file disappears (i.e. its holder finished) or becomes stale. Polls the file system with
+        exponential backoff from `poll` up to `max_poll` seconds.
+        '''
+        while os.path.exists(self.path) and not self.is_stale():
+            time.sleep(poll)
+            poll = min(2 * poll, max_poll)
+
+    def owner(self, path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def is_stale(self, path=None):
+        '''
+        Returns whether the lock file at `path` (default: this lock) is stale.
+        '''
+        path = path or self.path
+        try:
+            age = time.time() - os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        if age > self.timeout:
+            return True
+        owner = self.owner(path)
+        if owner.get('host') == socket.gethostname() and owner.get('pid') is not None:
+            return not _alive(owner['pid'])
+        return False
+
+    def _break(self):
+        broken = '{}.{}'.format(self.path, uuid.uuid4().hex)
+        try:
+            os.rename(self.path, broken)
+        except FileNotFoundError:
+            return
+        if not self.is_stale(broken):
+            # Another worker acquired a fresh lock after our staleness check. Give it back without clobbering:
+            try:
+                os.link(broken, self.path)
+            except OSError:
+                pass
+        os.remove(broken)
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat):
+            try:
+                os.utime(self.path, None)
+            except OSError:
+                pass
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
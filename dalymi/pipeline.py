@@ -1,8 +1,134 @@
 import argparse
+import asyncio
+import collections
+import copy
+from concurrent import futures
+from contextlib import contextmanager
+import functools
 from functools import wraps
+import hashlib
+import inspect
 import itertools
+import json
 import logging
+import os
 import pprint
+import threading
+import time
+import uuid
+
+from . import aio
+from .aio import offload
+from .assertions import ASSERTION_POLICIES
+from .cache import ObjectCache
+from .catalog import Catalog
+from .dag import DAG
+from .locking import TaskLock
+from .profiling import Profiler
+from .resources import Appended, Delta, LocalFileMixin, Partitioned
+from .scheduler import BACKENDS, Scheduler
+from .server import DEFAULT_SOCKET, Server
+from . import transport
+from .transport import SharedMemoryTransport
+from .utils import parse_grid, parse_size
+
+
+FINGERPRINTS = ('mtime', 'content', 'off')
+GC_POLICIES = ('lru', 'cost')
+
+_MISSING = object()  # marks prefetched inputs which did not exist
+
+logger = logging.getLogger(__name__)
+
+
+class Task:
+    '''
+    The registration of a task in a `Pipeline`.
+
+    # Attributes
+    name (str): the name of the task function
+    original (callable): the undecorated task function
+    func (callable): the function run by the output wrapper, i.e. the input wrapper if the task has inputs
+    wrapped (callable): the outermost wrapper of the task, which is scheduled
+    inputs (tuple): the input resources, or `None` if the task has no `input` decorator
+    outputs (tuple): the output resources, or `None` if the task has no `output` decorator
+    context_names (frozenset): the memoized context keys the task depends on (see `Pipeline.get_context_names`)
+    '''
+    __slots__ = ('name', 'original', 'func', 'wrapped', 'inputs', 'outputs', 'context_names')
+
+    def __init__(self, name, func, wrapped, inputs=None, outputs=None):
+        self.name = name
+        self.original = inspect.unwrap(func)
+        self.func = func
+        self.wrapped = wrapped
+        self.inputs = inputs
+        self.outputs = outputs
+        self.context_names = None
+
+
+class _Names:
+    '''
+    Formats as the list of names of `resources`, which is only built if a log message is emitted.
+    '''
+    __slots__ = ('resources',)
+
+    def __init__(self, resources):
+        self.resources = resources
+
+    def __format__(self, spec):
+        return format(str([_.name for _ in self.resources]), spec)
+
+
+def _partitioned(resource):
+    '''
+    Returns the `Partitioned` resource `resource` is or wraps (as `Delta`), or `None`.
+    '''
+    resource = resource.resource if isinstance(resource, Delta) else resource
+    return resource if isinstance(resource, Partitioned) else None
+
+
+def _grid_contexts(context, grid):
+    '''
+    Returns a list of copies of `context` for every combination of the context values in `grid` (if any).
+    '''
+    keys = sorted(grid or {})
+    return [dict(context, **dict(zip(keys, values))) for values in itertools.product(*[grid[_] for _ in keys])]
+
+
+@functools.lru_cache(maxsize=None)
+def _source_hash(code):
+    '''
+    Returns a hash of the source code of a function given its code object (of the bytecode if the source is not
+    available). Memoized, since reading source code is expensive and tasks generated in a loop share their code.
+    '''
+    try:
+        source = inspect.getsource(code)
+    except (OSError, TypeError):
+        source = code.co_code.hex()
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _parameter_names(code):
+    '''
+    Returns the names of the parameters (except `**kwargs`) of a function given its code object.
+    '''
+    count = code.co_argcount + code.co_kwonlyargcount + (1 if code.co_flags & inspect.CO_VARARGS else 0)
+    return code.co_varnames[:count]
+
+
+def _indented(text):
+    return '\n'.join(['  ' + _ for _ in text.split('\n')])
+
+
+def _agree(assignment, other):
+    '''
+    Returns whether two assignments of context values (tuples of key-value pairs) agree on all shared keys.
+    '''
+    if not assignment or not other:
+        return True
+    values = dict(assignment)
+    return all(values.get(key, value) == value for key, value in other)
 
 
 class Pipeline:
@@ -11,26 +137,107 @@ class Pipeline:
     '''
 
     def __init__(self):
-        self.outputs = {}    # keys: funcs, values: list of output resources
-        self.producers = {}  # keys: resources, values: funcs_wrapped
-        self.funcs = {}      # keys: func names, values: funcs_wrapped
+        self.tasks = {}      # keys: func names, values: `Task` records
         self.consumers = []  # list of (resource name, func name)
-        self.original_funcs = {}  # keys: funcs_wrapped, values: funcs
+        self.dag = DAG()     # name-based adjacency indexes of tasks and resources
+        self.pinned = set()  # names of resources never evicted by garbage collection
+        self.requirements = {}  # keys: func names, values: dicts of declared 'memory' and 'cpus'
+        self._cache = None   # run-scoped `ObjectCache` if enabled
+        self._pending = {}   # keys: cache keys, values: number of consumers scheduled in the current run
+        self._profiler = None  # run-scoped `Profiler` if enabled
+        self._writer = None    # run-scoped thread pool saving outputs in the background if enabled
+        self._writes = {}      # keys: cache keys, values: (future, data) of outputs being saved in the background
+        self._write_futures = []
+        self._io = None        # run-scoped `aio.IOLoop` running resource I/O concurrently
+        self._prefetches = None  # keys: (consumer name, cache key), values: futures of prefetched data if enabled
+        self._unfinished = collections.Counter()  # keys: task names, values: number of unfinished jobs
+        self._prefetch_lock = threading.Lock()
+        self._catalogs = {}    # keys: database paths, values: `Catalog` objects of this process
+        self._transport = None  # `SharedMemoryTransport` of this process for the current run
+        self._warm = None  # `WarmCache` kept across runs by a long-lived process (see `dalymi.server`)
+        self._local = threading.local()  # `delta`: whether a task received deltas and the new watermarks
+        self._available = set()  # cache keys of outputs known to exist in the current run
+        self._demands = {}  # keys: (task name, output paths), values: futures of on-demand production in this run
+        self._demand_lock = threading.Lock()
+
+    @property
+    def funcs(self):
+        '''
+        A dictionary of the scheduled (outermost) wrappers of tasks by task name.
+        '''
+        return {name: _.wrapped for name, _ in self.tasks.items()}
+
+    @property
+    def original_funcs(self):
+        '''
+        A dictionary of the functions run by task wrappers (see `Task.func`) by wrapper.
+        '''
+        return {_.wrapped: _.func for _ in self.tasks.values()}
+
+    @property
+    def inputs(self):
+        '''
+        A dictionary of the input resources of tasks (with an `input` decorator) by task name.
+        '''
+        return {name: _.inputs for name, _ in self.tasks.items() if _.inputs is not None}
+
+    @property
+    def outputs(self):
+        '''
+        A dictionary of the output resources of tasks (with an `output` decorator) by function run by the task wrapper.
+        '''
+        return {_.func: _.outputs for _ in self.tasks.values() if _.outputs is not None}
+
+    @property
+    def producers(self):
+        '''
+        A dictionary of the scheduled wrappers of tasks by output resource.
+        '''
+        return {resource: _.wrapped for _ in self.tasks.values() for resource in _.outputs or ()}
+
+    def _inputs(self, task):
+        return self.tasks[task].inputs or ()
+
+    def _outputs(self, task):
+        return self.tasks[task].outputs or ()
+
+    def _known(self, resource, context):
+        '''
+        Returns whether `resource` is available without checking it, because it is being saved in the background or
+        was saved (or found) by its producer in the current run.
+        '''
+        key = self._cache_key(resource, context)
+        return key in self._writes or key in self._available
 
     def _create_input_wrapper(self, func, input):
 
         @wraps(func)
         def func_wrapped(**context):
-            missing = [_ for _ in input if not _._check(context)]
-            producers_missing = [self.producers[_] for _ in missing]
-            for producer in producers_missing:
-                self.log('Running producer <{}>.'.format(producer.__name__))
-                producer(**context)
-            self.log('Loading inputs {}.'.format([_.name for _ in input]))
-            input_dict = {_.name: _._load(context) for _ in input}
+            unchecked = [_ for _ in input if not (_.cacheable and self._known(_, context))]
+            missings = self._gather([self._amissing(_, context) for _ in unchecked], self._inline(unchecked))
+            for resource, missing in zip(unchecked, missings):
+                for missing_context in missing:
+                    self._demand(self.tasks[self.dag.producers[resource.name]], missing_context)
+            self.log('Loading inputs {}.', _Names(input))
+            deltas = [_.name for _ in input if isinstance(_, Delta)]
+            watermarks = self._watermarks(func.__name__, context) if deltas else None
+            if watermarks is not None and not all(_ in watermarks for _ in deltas):
+                watermarks = None  # e.g. an input was added
+            if watermarks is not None:
+                watermarks = self._matching_watermarks(input, context, watermarks)
+            marks = {}
+            data = self._gather([self._aload_input(_, context, func.__name__, watermarks, marks) for _ in input],
+                                self._inline(input))
+            if deltas:
+                self._local.delta = (watermarks is not None, marks)
+            input_dict = {resource.name: _ for resource, _ in zip(input, data)}
             kwargs = {**input_dict, **context}
-            self.log('Attempting to run function <{}>.'.format(func.__name__))
-            results = func(**kwargs)
+            self.log('Attempting to run function <{}>.', func.__name__)
+            with self._span('task', func.__name__, func.__name__):
+                results = func(**kwargs)
+            del data, input_dict, kwargs  # detach from shared memory segments no result refers to:
+            if self._transport is not None:
+                self._transport.release()
             return results
 
         return func_wrapped
@@ -39,25 +246,467 @@ class Pipeline:
 
         @wraps(func)
         def func_wrapped(**context):
-            self.log('Checking if outputs of function <{}> exist.'.format(func.__name__))
-            missing = [_ for _ in output if not _._check(context)]
-            if missing:
-                self.log('Missing outputs {} of function <{}>.'.format([_.name for _ in missing], func.__name__))
-            else:
-                self.log('Skipping function <{}>, because all outputs exist.'.format(func.__name__))
-                return
-            results = func(**context)
-            if not isinstance(results, tuple):
-                results = (results,)
-            self.log('Saving outputs of function <{}>.'.format(func.__name__))
-            resources = self.outputs[func]
-            for resource, result in zip(resources, results):
-                resource._save(result, context)
-            return results
+            try:
+                return self._produce(func, output, context)
+            finally:
+                if self._prefetches is not None:
+                    with self._prefetch_lock:
+                        self._unfinished[func.__name__] -= 1
 
         return func_wrapped
 
-    def input(self, *input):
+    def _produce(self, func, output, context, demanded=False):
+        if not self._needs_run(func.__name__, output, context, demanded=demanded):
+            self._release_inputs(func.__name__, context)
+            return
+        if not context.get('distributed'):
+            return self._execute(func, output, context)
+        lock = self._claim(func.__name__, output, context, demanded)
+        if lock is None:
+            self._release_inputs(func.__name__, context)
+            return
+        try:
+            return self._execute(func, output, context)
+        finally:
+            lock.release()
+
+    def _demand(self, producer, context):
+        '''
+        Produces the outputs of `producer` (a `Task` record) for `context` on demand of a consumer. Concurrent
+        demands of the same outputs in this run wait for the first one instead of producing them again.
+        '''
+        key = (producer.name, tuple(_.path(context) for _ in producer.outputs))
+        with self._demand_lock:
+            future = self._demands.get(key)
+            first = future is None
+            if first:
+                future = self._demands[key] = futures.Future()
+        if not first:
+            self.log('Waiting for producer <{}>.', producer.name)
+            return future.result()
+        self.log('Running producer <{}>.', producer.name)
+        try:
+            future.set_result(self._produce(producer.func, producer.outputs, context, demanded=True))
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        return future.result()
+
+    def _needs_run(self, task, output, context, quiet=False, demanded=False):
+        log = (lambda message, *args: None) if quiet else self.log
+        log('Checking if outputs of function <{}> exist.', task)
+        missing = [_ for _ in output if not self._exists(_, context)]
+        if missing and not demanded and self._rebuilt_on_demand(task, missing, context):
+            log('Skipping function <{}>, because its outputs were evicted and are rebuilt when needed.', task)
+            return False
+        elif missing:
+            log('Missing outputs {} of function <{}>.', _Names(missing), task)
+        elif self.is_stale(task, context):
+            log('Outputs of function <{}> are stale.', task)
+        else:
+            log('Skipping function <{}>, because all outputs exist.', task)
+            self._available.update(self._cache_key(_, context) for _ in output)
+            return False
+        return True
+
+    def _rebuilt_on_demand(self, task, missing, context):
+        '''
+        Returns whether the `missing` outputs of `task` were all evicted by garbage collection and are up to date
+        otherwise. Such outputs are only rebuilt when a consumer needs them (or if `task` is run explicitly).
+        '''
+        if context.get('task') == task or not all(_._evicted(context) for _ in missing):
+            return False
+        return not self.is_stale(task, context)
+
+    def _lock_path(self, output, context):
+        path = output[0].path(context)
+        directory, basename = os.path.split(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, '.{}.lock'.format(basename))
+
+    def _claim(self, task, output, context, demanded=False):
+        '''
+        Claims `task` for this worker by acquiring its lock. If another worker holds the lock, waits until the lock is
+        released and returns `None` if the outputs are complete (or retries otherwise). Returns the acquired lock.
+        '''
+        lock = TaskLock(self._lock_path(output, context))
+        while not lock.acquire():
+            self.log('Function <{}> is claimed by another worker, waiting.', task)
+            lock.wait()
+            if not self._needs_run(task, output, context, quiet=True, demanded=demanded):
+                self.log('Skipping function <{}>, because another worker produced its outputs.', task)
+                return None
+        # finished by another worker before we claimed it:
+        if not self._needs_run(task, output, context, quiet=True, demanded=demanded):
+            lock.release()
+            self.log('Skipping function <{}>, because another worker produced its outputs.', task)
+            return None
+        return lock
+
+    def _execute(self, func, output, context):
+        if self._prefetches is not None:
+            self._prefetch_children(func.__name__, context)
+        started = time.perf_counter()
+        self._local.delta = None
+        if self.tasks[func.__name__].inputs is not None:
+            results = func(**context)  # the input wrapper profiles the task itself
+        else:
+            with self._span('task', func.__name__, func.__name__):
+                results = func(**context)
+        delta, self._local.delta = self._local.delta, None  # set by the input wrapper if the task loaded deltas
+        if not isinstance(results, tuple):
+            results = (results,)
+        task = func.__name__
+        if self._writer is not None and all(_.cacheable for _ in output):
+            self.log('Saving outputs of function <{}> in the background.', task)
+            keys = [self._cache_key(_, context) for _ in output]
+            future = self._writer.submit(self._persist, task, output, results, context, started, delta)
+            self._writes.update({key: (future, result) for key, result in zip(keys, results)})
+            future.add_done_callback(lambda _: [self._writes.pop(key, None) for key in keys])
+            self._write_futures.append(future)
+            shared = [copy.deepcopy(_) for _ in results]  # the objects being saved stay private to the writer
+        else:
+            self.log('Saving outputs of function <{}>.', task)
+            self._persist(task, output, results, context, started, delta)
+            shared = results
+        for resource, result in zip(output, shared):
+            self._cache_output(resource, result, context)
+        return results
+
+    def _persist(self, task, output, results, context, started, delta=None):
+        self._wait_for_inputs(task, context)  # input stamps are part of the fingerprint
+        append = delta is not None and delta[0]
+        self._gather([self._asave_output(resource, result, context, task, append)
+                      for resource, result in zip(output, results)], self._inline(output))
+        self._available.update(self._cache_key(_, context) for _ in output)
+        fingerprint = self._record_fingerprint(task, context)
+        if delta is not None:
+            self._record_watermarks(output, context, delta[1])
+        catalog = self._catalog(context)
+        if catalog is not None:
+            duration = time.perf_counter() - started
+            for resource in output:
+                self._catalog_record(catalog, resource, task, context, duration, fingerprint)
+
+    async def _asave_output(self, resource, data, context, task, append=False):
+        with self._span('save', resource.name, task) as span:
+            if append and isinstance(resource, Appended):
+                self.log('Appending to <{}>.', resource.name)
+                await resource._aappend(data, context)
+            else:
+                await resource._asave(data, context)
+            await self._warm_put(resource, data, context)
+            if self._profiler is not None:
+                span['bytes'] = await offload(resource._size, context)
+
+    def _wait_for_inputs(self, task, context):
+        for resource in self._inputs(task):
+            if resource.cacheable:
+                write = self._writes.get(self._cache_key(resource, context))
+                if write is not None:
+                    write[0].result()
+
+    def _catalog(self, context):
+        '''
+        Returns the run catalog configured in `context` (opened once per process), or `None`.
+        '''
+        path = context.get('catalog')
+        if not path:
+            return None
+        if path not in self._catalogs:
+            self._catalogs[path] = Catalog(path)
+        return self._catalogs[path]
+
+    def _catalog_record(self, catalog, resource, task, context, duration=None, fingerprint=None):
+        mode = self._fingerprint_mode(context)
+        values = {_: context[_] for _ in self.get_context_names(task) if _ in context}
+        catalog.record(resource.path(context), resource.name, task=task, context=values,
+                       size=resource._size(context), stamp=resource._stamp(context, content=(mode == 'content')),
+                       duration=duration, fingerprint=fingerprint, mode=mode)
+
+    def _catalog_entry(self, resource, context):
+        '''
+        Returns the record of `resource` in the run catalog, or `None` if there is no catalog, the resource is not
+        recorded (or not produced by the pipeline) or the context asks to `verify` the catalog.
+        '''
+        catalog = self._catalog(context)
+        if catalog is None or context.get('verify') or _partitioned(resource) is not None or \
+                resource.name not in self.dag.producers:
+            return None
+        return catalog.get(resource.path(context))
+
+    def _exists(self, resource, context):
+        '''
+        Returns whether `resource` exists for `context`. Resources recorded in the run catalog count as existing
+        without checking them, unless the context asks to `verify` the catalog. External inputs (without producer in
+        the pipeline) are always checked, since they may change outside of runs.
+        '''
+        catalog = self._catalog(context)
+        if catalog is None or _partitioned(resource) is not None or resource.name not in self.dag.producers:
+            return resource._check(context)
+        path = resource.path(context)
+        recorded = catalog.exists(path)
+        if recorded and not context.get('verify'):
+            return True
+        exists = resource._check(context)
+        if exists and not recorded:  # e.g. produced before the catalog was used
+            meta = resource._read_meta(context) or {}
+            fingerprint = meta.get('fingerprint') if meta.get('mode') == self._fingerprint_mode(context) else None
+            self._catalog_record(catalog, resource, self.dag.producers[resource.name], context,
+                                 fingerprint=fingerprint)
+        elif recorded and not exists:
+            self.log('Removing <{}> at \'{}\' from the catalog, because it does not exist.', resource.name, path)
+            catalog.forget(path)
+        return exists
+
+    async def _amissing(self, resource, context):
+        if self._catalog(context) is None or _partitioned(resource) is not None or \
+                resource.name not in self.dag.producers:
+            return await resource._amissing(context)
+        return [] if await offload(self._exists, resource, context) else [context]
+
+    def _fingerprint_mode(self, context):
+        return context.get('fingerprint', 'mtime')
+
+    def _record_fingerprint(self, task, context):
+        '''
+        Records the fingerprint of `task` with its outputs and returns it (or `None` if fingerprints are off).
+        '''
+        mode = self._fingerprint_mode(context)
+        if mode == 'off':
+            return None
+        fingerprint = self.fingerprint(task, context, content=(mode == 'content'))
+        for resource in self._outputs(task):
+            meta = resource._read_meta(context) or {}  # keeps other records, e.g. of passed assertions
+            meta.update(fingerprint=fingerprint, mode=mode)
+            resource._write_meta(context, meta)
+        return fingerprint
+
+    def _watermarks(self, task, context):
+        '''
+        Returns the watermarks of `Delta` inputs recorded with the outputs of `task` (keys: resource names), or `None`
+        if an output is missing, lacks watermarks or changed since they were recorded.
+        '''
+        watermarks = None
+        for resource in self._outputs(task):
+            record = (resource._read_meta(context) or {}).get('delta')
+            if not record or record['stamp'] != resource._stamp(context):
+                return None
+            if watermarks is not None and record['watermarks'] != watermarks:
+                return None
+            watermarks = record['watermarks']
+        return watermarks
+
+    def _matching_watermarks(self, input, context, watermarks):
+        '''
+        Returns `watermarks`, or `None` if the data below the watermark of a `Delta` input changed (e.g. because its
+        producer rewrote rows which were processed already).
+        '''
+        for resource in input:
+            if not isinstance(resource, Delta):
+                continue
+            write = self._writes.get(self._cache_key(resource, context)) if resource.resource.cacheable else None
+            if write is not None:
+                write[0].result()
+            if not resource._matches(watermarks[resource.name], context):
+                self.log('Loading all data of <{}>, because processed data changed.', resource.name)
+                return None
+        return watermarks
+
+    def _record_watermarks(self, output, context, watermarks):
+        for resource in output:
+            meta = resource._read_meta(context) or {}
+            meta['delta'] = {'stamp': resource._stamp(context), 'watermarks': watermarks}
+            resource._write_meta(context, meta)
+
+    def _cache_key(self, resource, context):
+        return (resource.name, resource.path(context))
+
+    def _cache_output(self, resource, data, context):
+        if not resource.cacheable:
+            return
+        if self._cache is not None:
+            key = self._cache_key(resource, context)
+            self._cache.put(key, data, self._pending.get(key, 0))
+        transport = self._transport_for(context)
+        if transport is not None and resource.name in self.dag.consumers:
+            if transport.put(self._cache_key(resource, context), data):
+                self.log('Handed <{}> over in shared memory.', resource.name)
+
+    def _transport_for(self, context):
+        '''
+        Returns the shared memory transport of the run in `context` (created once per process), or `None`.
+        '''
+        run = context.get('shared_memory')
+        if not run:
+            return None
+        if self._transport is None or self._transport.run != run:
+            self._transport = SharedMemoryTransport(run)
+        return self._transport
+
+    def _free_shared(self, transport, jobs, pending, key):
+        '''
+        Unlinks the shared memory segments of inputs and outputs of the finished job `key` which no scheduled
+        consumer needs anymore.
+        '''
+        name, job_context = key[0], jobs[key][1]
+        for resource in self._inputs(name):
+            if resource.cacheable:
+                pending[self._cache_key(resource, job_context)] -= 1
+        for resource in itertools.chain(self._inputs(name), self._outputs(name)):
+            if resource.cacheable and pending[self._cache_key(resource, job_context)] <= 0:
+                transport.unlink(self._cache_key(resource, job_context))
+
+    async def _aload_delta(self, resource, context, task, watermarks, marks):
+        '''
+        Loads the data of `Delta` input `resource` beyond its recorded watermark and puts the new watermark in `marks`.
+        '''
+        if resource.resource.cacheable:  # wait for a background save of the underlying resource
+            write = self._writes.get(self._cache_key(resource, context))
+            if write is not None:
+                await asyncio.wrap_future(write[0])
+        watermark = watermarks.get(resource.name) if watermarks is not None else None
+        with self._span('load', resource.name, task):
+            data, marks[resource.name] = await offload(resource._load_delta, context, watermark)
+        if watermark is None:
+            self.log('Loaded all data of <{}>.', resource.name)
+        else:
+            self.log('Loaded the delta of <{}> beyond watermark {}.', resource.name, watermark)
+        return data
+
+    async def _aload_input(self, resource, context, task, watermarks=None, marks=None):
+        if isinstance(resource, Delta):
+            return await self._aload_delta(resource, context, task, watermarks, marks)
+        catalog = self._catalog(context)
+        if catalog is not None and not isinstance(resource, Partitioned):
+            catalog.touch(resource.path(context))
+        with self._span('load', resource.name, task) as span:
+            key = self._cache_key(resource, context) if resource.cacheable else None
+            if self._cache is not None and key is not None:
+                try:
+                    data = resource.adapt(self._cache.take(key))
+                    self.log('Took <{}> from the in-memory cache.', resource.name)
+                    span['cached'] = True
+                    return data
+                except KeyError:
+                    pass
+            transport = self._transport_for(context)
+            if transport is not None and key is not None:
+                try:
+                    data = resource.adapt(transport.get(key))
+                    self.log('Attached to <{}> in shared memory.', resource.name)
+                    span['shared'] = True
+                    return data
+                except KeyError:
+                    pass
+            write = self._writes.get(key)
+            if write is not None:
+                self.log('Took <{}> from a pending background save.', resource.name)
+                span['cached'] = True
+                return resource.adapt(await offload(copy.deepcopy, write[1]))
+            prefetch = self._prefetches.pop((task, key), None) if self._prefetches is not None else None
+            if prefetch is not None:
+                try:
+                    data = await asyncio.wrap_future(prefetch)
+                except Exception:
+                    data = _MISSING  # load again below to raise the error in the consuming task
+                if data is not _MISSING:
+                    self.log('Took <{}> from prefetched inputs.', resource.name)
+                    span['prefetched'] = True
+                    return data
+            stamp = await offload(resource._stamp, context) if self._warm is not None and key is not None else None
+            if stamp is not None:
+                try:
+                    data = resource.adapt(self._warm.get(key, stamp))
+                except KeyError:
+                    data = _MISSING
+                if data is not _MISSING:
+                    self.log('Took <{}> from the warm cache.', resource.name)
+                    span['cached'] = True
+                    # as if loaded, e.g. cheap assertions run again:
+                    await offload(resource._assert_loaded, data, resource.path(context), context)
+                    return data
+            data = await resource._aload(context)
+            if getattr(resource, 'selected', None) is None:  # other consumers may need all columns
+                await self._warm_put(resource, data, context, stamp)
+            if self._profiler is not None:
+                span['bytes'] = await offload(resource._size, context)
+            return data
+
+    async def _warm_put(self, resource, data, context, stamp=None):
+        '''
+        Keeps `data` of `resource` in the warm cache (if there is one) for subsequent runs.
+        '''
+        if self._warm is None or not resource.cacheable:
+            return
+        stamp = stamp or await offload(resource._stamp, context)
+        if stamp is not None:
+            self._warm.put(self._cache_key(resource, context), stamp, data)
+
+    def _prefetch_children(self, task, context):
+        '''
+        Starts loading those inputs of consumers of `task` in the background, which are not produced by `task` and
+        whose producers finished.
+        '''
+        produced = set(self.dag.outputs[task])
+        for child in self.dag.children(task):
+            for resource in self._inputs(child):
+                if not resource.cacheable or resource.name in produced:
+                    continue
+                try:
+                    key = self._cache_key(resource, context)
+                except (KeyError, IndexError):
+                    continue  # the location depends on context values of the consumer
+                with self._prefetch_lock:
+                    if self._unfinished[self.dag.producers.get(resource.name)] > 0 or (child, key) in self._prefetches:
+                        continue
+                    if key in self._writes or (self._cache is not None and key in self._cache):
+                        continue
+                    self.log('Prefetching <{}> for function <{}>.', resource.name, child)
+                    self._prefetches[(child, key)] = self._io.submit(self._aprefetch(resource, context))
+
+    async def _aprefetch(self, resource, context):
+        if not await resource._acheck(context):
+            return _MISSING
+        return await resource._aload(context)
+
+    def _inline(self, resources):
+        '''
+        Returns whether the I/O of `resources` may run inline (see `aio.run_inline`): if there is nothing to run
+        concurrently (at most one resource), nor to wait for (prefetches or background saves of deltas) and the
+        resource only offloads blocking calls.
+        '''
+        if len(resources) > 1 or self._prefetches is not None:
+            return False
+        return all(_.inline and not (self._writer is not None and isinstance(_, Delta)) for _ in resources)
+
+    def _gather(self, coroutines, inline=False):
+        '''
+        Runs `coroutines` (e.g. resource I/O) concurrently, on the I/O loop of the current run if there is one. If
+        `inline` is true, runs them in the calling thread instead, which avoids the overhead of handing them over.
+        '''
+        if inline:
+            return aio.run_inline(coroutines)
+        if self._io is not None:
+            return self._io.gather(coroutines)
+        return aio.gather(coroutines)
+
+    @contextmanager
+    def _span(self, category, name, task):
+        if self._profiler is None:
+            yield {}
+        else:
+            with self._profiler.span(category, name, task) as span:
+                yield span
+
+    def _release_inputs(self, task, context):
+        if self._cache is not None:
+            for resource in self._inputs(task):
+                if resource.cacheable:
+                    self._cache.release(self._cache_key(resource, context))
+
+    def input(self, *input, memory=None, cpus=None):
         '''
         A decorator to specify input resources for the decorated task.
 
@@ -66,20 +715,28 @@ class Pipeline:
 
         # Arguments
         *input: a list of resource objects
+        memory (int or str): the peak memory the task requires (e.g. `'4G'`), see `run`
+        cpus (int): the number of CPU slots the task occupies (default: 1), see `run`
         '''
         def decorator(func):
+            self._declare(func.__name__, memory, cpus)
             func_wrapped = self._create_input_wrapper(func, input)
-            self.log('Registering <{}> as a consumer function.'.format(func.__name__))
+            self.log('Registering <{}> as a consumer function.', func.__name__)
             self.consumers.extend([(_.name, func.__name__) for _ in input])
-            # This will be overwritten by an output decorator, because the output decorator
+            self.dag.add_inputs(func.__name__, [_.name for _ in input])
+            # The wrappers will be replaced by an output decorator, because the output decorator
             # has to wrap the input decorator:
-            self.funcs[func.__name__] = func_wrapped
-            # Same here:
-            self.original_funcs[func_wrapped] = func
+            self.tasks[func.__name__] = Task(func.__name__, func, func_wrapped, inputs=input)
             return func_wrapped
         return decorator
 
-    def output(self, *output):
+    def _declare(self, task, memory, cpus):
+        if memory is not None:
+            self.requirements.setdefault(task, {})['memory'] = parse_size(memory)
+        if cpus is not None:
+            self.requirements.setdefault(task, {})['cpus'] = cpus
+
+    def output(self, *output, pinned=False, memory=None, cpus=None):
         '''
         A decorator to specify output resources for the decorated task.
 
@@ -89,16 +746,22 @@ class Pipeline:
 
         # Arguments
         *output: a list of resource objects
+        pinned (bool): if true, the outputs are never evicted by garbage collection (see `gc`)
+        memory (int or str): the peak memory the task requires (e.g. `'4G'`), see `run`
+        cpus (int): the number of CPU slots the task occupies (default: 1), see `run`
         '''
         def decorator(func):
+            self._declare(func.__name__, memory, cpus)
             func_wrapped = self._create_output_wrapper(func, output)
-            self.log('Registering {} as output of <{}>.'.format([_.name for _ in output], func.__name__))
-            self.outputs[func] = output
-            for resource in output:
-                self.producers[resource] = func_wrapped
-            self.log('Registering <{}> as producer function.'.format(func.__name__))
-            self.funcs[func.__name__] = func_wrapped
-            self.original_funcs[func_wrapped] = func
+            if pinned:
+                self.pinned.update(_.name for _ in output)
+            self.log('Registering {} as output of <{}>.', _Names(output), func.__name__)
+            self.dag.add_outputs(func.__name__, [_.name for _ in output])
+            self.log('Registering <{}> as producer function.', func.__name__)
+            task = self.tasks.get(func.__name__) or Task(func.__name__, func, func_wrapped)
+            task.original, task.func, task.wrapped, task.outputs = inspect.unwrap(func), func, func_wrapped, output
+            task.context_names = None  # output locations add placeholders
+            self.tasks[func.__name__] = task
             return func_wrapped
         return decorator
 
@@ -130,76 +793,582 @@ class Pipeline:
         with open('pipeline.dot', 'w') as f:
             f.write(dot)
 
-    def log(self, message):
+    def log(self, message, *args):
         '''
-        Logs the supplied message to a Python logger named `__name__` on log level `INFO`.
+        Logs the supplied message to a Python logger named `__name__` on log level `INFO`. If `args` are given, the
+        message is formatted with them (`str.format`) only if `INFO` is enabled, so that disabled logging is cheap.
         '''
-        logger = logging.getLogger(__name__)
-        logger.info(message)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(message.format(*args) if args else message)
 
     def ls(self):
-        tasks = list(self.funcs.keys())
+        tasks = list(self.tasks.keys())
         msg = 'Tasks in pipeline:\n'
         for task in tasks:
             msg += '\t{}\n'.format(task)
         print(msg, end='')
 
-    def run(self, task=None, **context):
+    def run(self, task=None, workers=1, backend='thread', cache_size=None, fingerprint='mtime', profile=None,
+            grid=None, distributed=False, write_behind=0, prefetch=False, catalog=None, verify=False, memory=None,
+            cpus=None, shared_memory=False, assertions='cheap', **context):
+        '''
+        Runs a single task (and any producers of its missing inputs) or, if no task is given, the entire DAG.
+
+        # Arguments
+        task (str): the name of the task to run
+        workers (int): the maximum number of tasks to run at the same time
+        backend (str): `'thread'` or `'process'`, the type of worker pool used if `workers > 1`
+        cache_size (int or str): if given, task results are handed to consumers of the same run in memory instead of
+            being re-loaded, using at most this many bytes (e.g. `2**30` or `'1G'`)
+        fingerprint (str): how to detect stale outputs: `'mtime'` compares modification times and sizes of inputs,
+            `'content'` compares content hashes of inputs and `'off'` only checks whether outputs exist
+        profile (str): if given, the path of a JSON file to write time, CPU time, peak memory and bytes read/written
+            per task and resource to (including Chrome trace events)
+        grid (dict): keys: context keys, values: lists of values to sweep over. Tasks depending on a swept key (via
+            a named parameter or a placeholder in a resource location) run once per value (combination), all other
+            tasks run once.
+        distributed (bool): if true, tasks are claimed with lock files next to their first output before they run, so
+            that several `run` invocations (processes or machines sharing a file system) can drain the same DAG
+            without duplicating work
+        write_behind (int): if positive, the number of background threads saving outputs. Consumers start on the
+            in-memory results while they are saved, and the run waits for all saves before it returns. Chunked outputs
+            are always saved by their task.
+        prefetch (bool): if true, inputs of a task's consumers which are available already are loaded in the
+            background while the task runs
+        catalog (str): if given, the path of a SQLite database recording materialized outputs (see `status`). Recorded
+            outputs count as existing without checking them.
+        verify (bool): if true, check recorded outputs anyway and remove records of outputs which do not exist
+        memory (int or str): if given, tasks only run at the same time if the sum of their declared memory (see
+            `output`) fits into this limit (e.g. `'64G'`), minus the budget of the in-memory cache
+        cpus (int): if given, tasks only run at the same time if the sum of their declared CPU slots fits into this
+            limit
+        shared_memory (bool): if true and tasks run on the `process` backend, results with large buffers (e.g.
+            `numpy` arrays, `pandas` data frames) are handed to consumers in shared memory instead of being re-loaded.
+            Requires Python >= 3.8.
+        assertions (str): how resource assertions which passed when an output was saved are used when loading it
+            unchanged: `'strict'` runs all assertions on each load anyway, `'cheap'` only runs assertions marked as
+            cheap and `'recorded'` skips them all (see `dalymi.assertions`)
+        **context: the context passed to tasks and used to format resource locations
+        '''
+        if fingerprint not in FINGERPRINTS:
+            raise ValueError('Unknown fingerprint \'{}\'. Choose one of {}.'.format(fingerprint, FINGERPRINTS))
+        if assertions not in ASSERTION_POLICIES:
+            raise ValueError('Unknown assertion policy \'{}\'. Choose one of {}.'
+                             .format(assertions, ASSERTION_POLICIES))
         context['task'] = task
-        pretty_context = pprint.pformat(context)
-        pretty_indented_context = '\n'.join(['  ' + _ for _ in pretty_context.split('\n')])
-        self.log('Running with context:\n' + pretty_indented_context)
-        if task:
-            func = self.funcs[task]
-            func(**context)
-        else:
+        context['fingerprint'] = fingerprint
+        context['distributed'] = distributed
+        context['catalog'] = catalog
+        context['verify'] = verify
+        context['assertions'] = assertions
+        if shared_memory and not (workers > 1 and backend == 'process'):
+            self.log('Not using shared memory, because tasks do not run in separate processes.')
+        elif shared_memory and not transport.AVAILABLE:
+            self.log('Not using shared memory, which requires Python >= 3.8.')
+        context['shared_memory'] = uuid.uuid4().hex if shared_memory and workers > 1 and backend == 'process' \
+            and transport.AVAILABLE else None
+        if logger.isEnabledFor(logging.INFO):
+            self.log('Running with context:\n{}', _indented(pprint.pformat(context)))
+        if not task:
             self.log('Auto-running DAG.')
-            for func in self.funcs.values():
-                self.log('Attempting function <{}>.'.format(func.__name__))
-                func(**context)
+        jobs, dependencies = self._create_jobs(task, context, grid or {})
+        if cache_size and workers > 1 and backend == 'process':
+            self.log('Disabling the in-memory cache, because tasks run in separate processes.')
+        elif cache_size:
+            self._cache = ObjectCache(parse_size(cache_size))
+            self._pending = collections.Counter(self._cache_key(resource, job_context)
+                                                for (name, _), (_, job_context) in jobs.items()
+                                                for resource in self._inputs(name) if resource.cacheable)
+        if profile and workers > 1 and backend == 'process':
+            self.log('Profiling is not supported with the process backend.')
+        elif profile:
+            self._profiler = Profiler()
+            self._profiler.start()
+        if write_behind and (distributed or (workers > 1 and backend == 'process')):
+            self.log('Disabling write-behind, which supports neither distributed runs nor the process backend.')
+        elif write_behind:
+            self._writer = futures.ThreadPoolExecutor(max_workers=write_behind)
+        if workers == 1 or backend == 'thread':
+            self._io = aio.IOLoop()
+            if prefetch:
+                self._prefetches = {}
+                self._unfinished = collections.Counter(name for name, _ in jobs)
+        elif prefetch:
+            self.log('Prefetching is not supported with the process backend.')
+        if memory is not None:
+            memory = parse_size(memory) - (self._cache.budget if self._cache is not None else 0)
+            if memory < 0:
+                raise ValueError('The cache size exceeds the memory limit.')
+        scheduler = Scheduler(workers=workers, backend=backend, memory=memory, cpus=cpus)
+        requirements = {key: (self.requirements.get(key[0], {}).get('memory', 0),
+                              self.requirements.get(key[0], {}).get('cpus', 1)) for key in jobs}
+        shared = self._transport_for(context)
+        callback = None
+        if shared is not None:
+            pending = collections.Counter(self._cache_key(resource, job_context)
+                                          for (name, _), (_, job_context) in jobs.items()
+                                          for resource in self._inputs(name) if resource.cacheable)
+            callback = functools.partial(self._free_shared, shared, jobs, pending)
+        try:
+            scheduler.run(jobs, dependencies, requirements, self._job_costs(jobs, context), callback)
+        finally:
+            if shared is not None:
+                for key in list(pending):  # segments of failed or cancelled jobs
+                    shared.unlink(key)
+                self._transport = None
+            errors = self._wait_for_writes()
+            if self._io is not None:
+                self._io.close()
+                self._io = None
+            self._prefetches = None
+            self._unfinished = collections.Counter()
+            if catalog in self._catalogs:
+                self._catalogs.pop(catalog).close()
+            self._cache = None
+            self._pending = {}
+            self._available = set()
+            self._demands = {}
+            if self._profiler is not None:
+                self._profiler.stop()
+                self._profiler.export(profile)
+                self.log('Wrote profile to \'{}\'.', profile)
+                self._profiler = None
+        if errors:
+            raise errors[0]
 
-    def get_downstream_tasks(self, task):
-        func = self.funcs[task]
-        original_func = self.original_funcs[func]
-        if original_func in self.outputs:
-            func_outputs = self.outputs[original_func]
+    def _job_costs(self, jobs, context):
+        '''
+        Returns the expected durations of jobs (as recorded in the catalog) to prioritize the critical path, or
+        `None` if there is no catalog.
+        '''
+        catalog = self._catalog(context)
+        if catalog is None:
+            return None
+        durations = {}
+        for entry in catalog.entries():
+            if entry['task'] and entry['duration'] is not None:
+                durations[entry['task']] = max(durations.get(entry['task'], 0.), entry['duration'])
+        default = sum(durations.values()) / len(durations) if durations else 1.
+        return {key: durations.get(key[0], default) for key in jobs}
+
+    def _wait_for_writes(self):
+        '''
+        Waits for all background saves of the current run (if any) and returns the exceptions they raised.
+        '''
+        if self._writer is None:
+            return []
+        self.log('Waiting for background saves to finish.')
+        self._writer.shutdown(wait=True)
+        errors = [_.exception() for _ in self._write_futures if _.exception() is not None]
+        self._writer = None
+        self._write_futures = []
+        self._writes = {}
+        return errors
+
+    def fingerprint(self, task, context, content=False):
+        '''
+        Returns a hash of everything the outputs of `task` are derived from: the source code of the task, the stamps
+        of its inputs (modification time and size or, if `content` is true, content hashes) and the context values
+        it uses (named parameters of the task and placeholders in the locations of its resources). Input stamps are
+        taken from the run catalog if possible (see `_input_stamp`).
+        '''
+        inputs = self._inputs(task)
+        names = self.get_context_names(task)
+        fingerprint = {
+            'source': _source_hash(self.tasks[task].original.__code__),
+            'inputs': {_.name: self._input_stamp(_, context, content) for _ in inputs},
+            'context': {_: repr(context[_]) for _ in sorted(names) if _ in context},
+        }
+        return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+
+    def _input_stamp(self, resource, context, content=False):
+        '''
+        Returns the stamp of `resource` recorded in the run catalog (if recorded in the requested mode) without
+        accessing the resource, or its current stamp otherwise.
+        '''
+        entry = self._catalog_entry(resource, context)
+        if entry is not None and entry['stamp'] is not None and entry['mode'] is not None and \
+                (entry['mode'] == 'content') == content:
+            return entry['stamp']
+        return resource._stamp(context, content=content)
+
+    def get_context_names(self, task):
+        '''
+        Returns the set of context keys `task` depends on: named parameters of the task function and placeholders in
+        the locations of its input and output resources.
+        '''
+        record = self.tasks[task]
+        if record.context_names is None:
+            names = set(_parameter_names(record.original.__code__))
+            names -= {_.name for _ in self._inputs(task)}
+            for resource in itertools.chain(self._inputs(task), self._outputs(task)):
+                names.update(resource.placeholders())
+            record.context_names = frozenset(names)
+        return record.context_names
+
+    def is_stale(self, task, context):
+        '''
+        Returns whether the fingerprint recorded with any output of `task` differs from the current fingerprint.
+        Fingerprints are compared in the mode they were recorded with. Outputs without recorded fingerprint (e.g.
+        created by older versions or resource types without metadata support) count as up to date. Fingerprints
+        recorded in the run catalog are used without reading metadata, unless the context asks to `verify` the
+        catalog.
+        '''
+        if self._fingerprint_mode(context) == 'off' or self.tasks[task].outputs is None:
+            return False
+        self._wait_for_inputs(task, context)
+        fingerprints = {}
+        for recorded, mode in self._recorded_fingerprints(task, context):
+            content = mode == 'content'
+            if content not in fingerprints:
+                fingerprints[content] = self.fingerprint(task, context, content=content)
+            if recorded != fingerprints[content]:
+                return True
+        return False
+
+    def _recorded_fingerprints(self, task, context):
+        '''
+        Returns the fingerprints recorded with the outputs of `task` as list of `(fingerprint, mode)` tuples.
+        '''
+        recorded = []
+        for resource in self._outputs(task):
+            entry = self._catalog_entry(resource, context)
+            if entry is not None and entry['fingerprint'] is not None:
+                recorded.append((entry['fingerprint'], entry['mode']))
+                continue
+            meta = resource._read_meta(context)
+            if meta and 'fingerprint' in meta:
+                recorded.append((meta['fingerprint'], meta.get('mode')))
+        return recorded
+
+    def _create_jobs(self, task, context, grid):
+        '''
+        Returns the jobs and dependencies to schedule for a run. Job keys are tuples of a task name and the
+        assignment of swept context keys the task depends on, e.g. `('train_model', (('clusters', 3),))`.
+        '''
+        if task and grid:
+            tasks = self.dag.topological_sort(self.dag.upstream(task) | {task})
+        elif task:
+            tasks = self.get_required_tasks(task, context)
         else:
-            func_outputs = []
-        consumers = set()
-        for output in func_outputs:
-            output_consumers = [fn for rn, fn in self.consumers if rn == output.name]
-            consumers.update(output_consumers)
-            for consumer in output_consumers:
-                consumer_consumers = self.get_downstream_tasks(consumer)
-                consumers.update(consumer_consumers)
-        return consumers
+            tasks = self.dag.topological_sort()
+        swept = sorted(grid)
+        if swept:
+            self.log('Sweeping over {}.', {_: list(grid[_]) for _ in swept})
+        jobs = collections.OrderedDict()
+        dependencies = {}
+        keys = {}  # keys: task names, values: job keys of the task
+        partition_keys = {_partitioned(_).key for record in self.tasks.values() for _ in record.inputs or ()
+                          if _partitioned(_) is not None}
+        for name in tasks:
+            outputs = self._outputs(name)
+            unresolved = {key for _ in outputs for key in _.placeholders()} - set(context) - set(swept)
+            if unresolved and unresolved <= partition_keys:
+                self.log('Skipping function <{}>, because partitions {} are produced on demand of consumers.',
+                         name, unresolved)
+                continue
+            names = self.get_context_names(name)
+            parameters = [_ for _ in swept if _ in names]
+            keys[name] = []
+            for values in itertools.product(*[grid[_] for _ in parameters]):
+                assignment = tuple(zip(parameters, values))
+                key = (name, assignment)
+                job_context = dict(context, **dict(assignment))
+                partitions = self._partition_jobs(name, job_context, assignment, jobs, dependencies, keys)
+                jobs[key] = (self.tasks[name].wrapped, job_context)
+                dependencies[key] = {parent_key for parent in self.dag.parents(name)
+                                     for parent_key in keys.get(parent, []) if _agree(parent_key[1], assignment)}
+                dependencies[key] |= partitions
+                keys[name].append(key)
+        return jobs, dependencies
+
+    def _partition_jobs(self, task, context, assignment, jobs, dependencies, keys):
+        '''
+        Adds jobs producing the missing partitions of the `Partitioned` inputs of the job of `task` with the given
+        `context` and `assignment` to `jobs`, so that the scheduler builds them in parallel (and only once for all
+        consumers). Returns the keys of these jobs. Job keys of partitions include the partition key, e.g.
+        `('extract', (('day', 3),))`.
+        '''
+        added = set()
+        for resource in self._inputs(task):
+            partitioned = _partitioned(resource)
+            producer = self.dag.producers.get(resource.name)
+            if partitioned is None or partitioned.values is None or producer is None:
+                continue
+            missing = partitioned._missing(context)
+            if not missing or (self._fingerprint_mode(context) == 'off' and
+                               all(self._exists(_, context) for _ in self._outputs(task))):
+                continue
+            names = self.get_context_names(producer)
+            shared = [_ for _ in assignment if _[0] in names and _[0] != partitioned.key]
+            for partition_context in missing:
+                partition = tuple(sorted(shared + [(partitioned.key, partition_context[partitioned.key])],
+                                         key=lambda _: _[0]))
+                key = (producer, partition)
+                if key not in jobs:
+                    jobs[key] = (self.tasks[producer].wrapped, dict(context, **dict(partition)))
+                    dependencies[key] = {parent_key for parent in self.dag.parents(producer)
+                                         for parent_key in keys.get(parent, []) if _agree(parent_key[1], partition)}
+                added.add(key)
+        return added
+
+    def get_required_tasks(self, task, context):
+        '''
+        Returns the names of the tasks which have to be attempted to execute `task` with the given `context`, i.e.
+        `task` itself and, recursively, the producers of its inputs, in topological order. Unless fingerprints are
+        turned off, these are all upstream tasks (since any of them could be stale). Otherwise, only producers of
+        missing inputs.
+        '''
+        if self._fingerprint_mode(context) != 'off':
+            return self.dag.topological_sort(self.dag.upstream(task) | {task})
+        required = {task}
+        stack = [task]
+        while stack:
+            for resource in self._inputs(stack.pop()):
+                producer_task = self.dag.producers.get(resource.name)
+                if producer_task is None or producer_task in required or self._exists(resource, context):
+                    continue
+                required.add(producer_task)
+                stack.append(producer_task)
+        return self.dag.topological_sort(required)
+
+    def get_downstream_tasks(self, task):
+        '''
+        Returns the set of names of all tasks which (directly or indirectly) consume outputs of `task`.
+        '''
+        return self.dag.downstream(task)
+
+    def plan(self, task=None, fingerprint='mtime', grid=None, **context):
+        '''
+        Prints and returns the names of the tasks which a `run` with the same arguments would execute (in order),
+        without executing any of them. Tasks of a parameter sweep are named like `'train_model[clusters=3]'`.
+        '''
+        context['task'] = task
+        context['fingerprint'] = fingerprint
+        jobs, dependencies = self._create_jobs(task, context, grid or {})
+        planned = []
+        for key, (_, job_context) in jobs.items():
+            outputs = self._outputs(key[0])
+            missing = [_ for _ in outputs if not self._exists(_, job_context)]
+            if not outputs or (missing and not self._rebuilt_on_demand(key[0], missing, job_context)):
+                planned.append(key)
+            elif fingerprint != 'off' and (dependencies[key] & set(planned) or
+                                           (not missing and self.is_stale(key[0], job_context))):
+                planned.append(key)
+        names = []
+        for name, assignment in planned:
+            if assignment:
+                name = '{}[{}]'.format(name, ', '.join('{}={}'.format(*_) for _ in assignment))
+            names.append(name)
+        msg = 'Tasks to run:\n'
+        for name in names:
+            msg += '\t{}\n'.format(name)
+        print(msg, end='')
+        return names
+
+    def status(self, task=None, catalog=None, grid=None, **context):
+        '''
+        Prints and returns the outputs of all tasks (or of `task`) as recorded in the run catalog, without accessing
+        the outputs themselves. Outputs whose location is determined by `context` (and `grid`) are reported as built
+        or missing. For other outputs (e.g. of parameter sweeps), all recorded locations are reported.
+
+        # Arguments
+        task (str): the name of the task to report
+        catalog (str): the path of the catalog database
+        grid (dict): keys: context keys, values: lists of values to report outputs of a parameter sweep for
+        **context: the context used to format resource locations
+        '''
+        if not catalog:
+            raise ValueError('Status requires a catalog.')
+        catalog = Catalog(catalog)
+        entries = []
+        msg = 'Outputs:\n'
+        try:
+            for name in [task] if task else self.dag.topological_sort():
+                for resource in self._outputs(name):
+                    if resource.placeholders() <= set(context) | set(grid or {}):
+                        paths = [resource.path(_) for _ in _grid_contexts(context, grid)]
+                        found = [catalog.get(path) or {'path': path, 'resource': resource.name, 'task': name}
+                                 for path in collections.OrderedDict.fromkeys(paths)]
+                    else:
+                        found = catalog.entries(resource=resource.name)
+                    for entry in found:
+                        entry['built'] = 'created' in entry
+                        entries.append(entry)
+                        msg += '\t<{}> of <{}> at \'{}\': '.format(resource.name, name, entry['path'])
+                        if not entry['built']:
+                            msg += 'missing\n'
+                            continue
+                        created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['created']))
+                        msg += 'built {}, {} bytes'.format(created, entry['size'])
+                        if entry['duration'] is not None:
+                            msg += ', took {:.1f}s'.format(entry['duration'])
+                        msg += '\n'
+        finally:
+            catalog.close()
+        print(msg, end='')
+        return entries
+
+    def gc(self, budget, policy='lru', workers=1, catalog=None, dry_run=False, **context):
+        '''
+        Evicts materialized outputs (of any context) until their total size fits into `budget`. Outputs are discovered
+        by matching their locations against the file system, so only outputs inheriting from `LocalFileMixin` are
+        considered. Pinned outputs (see `output`) and outputs of tasks without consumers are never evicted. Evicted
+        outputs are rebuilt when a consumer needs them (see `LocalFileMixin.evict`). Returns the evicted paths.
+
+        # Arguments
+        budget (int or str): the disk budget in bytes (e.g. `2**30` or `'100G'`)
+        policy (str): `'lru'` evicts least recently used outputs first, `'cost'` evicts outputs which are cheapest to
+            recompute (by task duration per byte, as recorded in the catalog) first
+        workers (int): the number of threads deleting files in parallel
+        catalog (str): the path of the run catalog, if any. It provides access times and task durations.
+        dry_run (bool): if true, only print and return which outputs would be evicted (with their sizes and the
+            total size freed)
+        **context: ignored
+        '''
+        if policy not in GC_POLICIES:
+            raise ValueError('Unknown policy \'{}\'. Choose one of {}.'.format(policy, GC_POLICIES))
+        budget = parse_size(budget)
+        records = {}
+        if catalog:
+            catalog = Catalog(catalog)
+            records = {_['path']: _ for _ in catalog.entries()}
+        locations = self._fixed_locations()
+        discovered = []
+        for name in self.dag.tasks:
+            for resource in self._outputs(name):
+                if not isinstance(resource, LocalFileMixin):
+                    continue
+                for path in resource.discover():
+                    # e.g. 'data/final.pkl' of another resource matching 'data/{part}.pkl':
+                    if locations.get(os.path.normpath(path), resource.name) == resource.name:
+                        discovered.append((resource, path))
+        kept = {os.path.normpath(path) for resource, path in discovered
+                if resource.name in self.pinned or resource.name not in self.dag.consumers}
+        total = 0
+        candidates = []
+        seen = set()
+        for resource, path in discovered:
+            if path in seen:
+                continue
+            seen.add(path)
+            size = resource.size(path) or 0
+            total += size
+            if os.path.normpath(path) in kept:
+                continue
+            record = records.get(path, {})
+            stat = os.stat(path)
+            candidates.append({'path': path, 'resource': resource, 'size': size,
+                               'accessed': record.get('accessed') or max(stat.st_atime, stat.st_mtime),
+                               'cost': (record.get('duration') or 0.) / max(size, 1)})
+        self.log('Found {} bytes of outputs for a budget of {} bytes.', total, budget)
+        candidates.sort(key=lambda _: _['accessed'] if policy == 'lru' else _['cost'])
+        evicted = []
+        for candidate in candidates:
+            if total <= budget:
+                break
+            evicted.append(candidate)
+            total -= candidate['size']
+        if total > budget:
+            self.log('Could not meet the budget, {} bytes are pinned or terminal outputs.', total)
+
+        if dry_run:
+            if catalog:
+                catalog.close()
+            msg = 'Outputs to evict:\n'
+            for candidate in evicted:
+                msg += '\t<{}> at \'{}\': {} bytes\n'.format(candidate['resource'].name, candidate['path'],
+                                                             candidate['size'])
+            msg += 'Total: {} bytes freed\n'.format(sum(_['size'] for _ in evicted))
+            print(msg, end='')
+            return [_['path'] for _ in evicted]
+
+        def evict(candidate):
+            self.log('Evicting <{}> at \'{}\' ({} bytes).', candidate['resource'].name, candidate['path'],
+                     candidate['size'])
+            candidate['resource'].evict(candidate['path'])
+            if catalog:
+                catalog.forget(candidate['path'])
+
+        try:
+            with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(evict, evicted))
+        finally:
+            if catalog:
+                catalog.close()
+        return [_['path'] for _ in evicted]
+
+    def _fixed_locations(self):
+        '''
+        Returns the locations of local file resources (inputs and outputs) without placeholders (keys: normalized
+        paths, values: resource names).
+        '''
+        locations = {}
+        for record in self.tasks.values():
+            for resource in itertools.chain(record.inputs or (), record.outputs or ()):
+                while isinstance(resource, (Delta, Partitioned)):
+                    resource = resource.resource
+                if isinstance(resource, LocalFileMixin) and not resource.placeholders():
+                    locations[os.path.normpath(resource.loc)] = resource.name
+        return locations
 
     def delete_output(self, tasks, context):
-        funcs = [self.funcs[_] for _ in tasks]
-        original_funcs = [self.original_funcs[_] for _ in funcs]
-        funcs_outputs = [self.outputs[_] for _ in original_funcs if _ in self.outputs]
-        outputs = set(itertools.chain(*funcs_outputs))
+        outputs = set(itertools.chain(*[self._outputs(_) for _ in tasks]))
+        catalog = self._catalog(context)
         for output in outputs:
-            if output._check(context):
-                loc = output.loc.format(**context)
-                self.log('Deleting <{}> at \'{}\'.'.format(output.name, loc))
+            if self._exists(output, context) or output._evicted(context):
+                loc = output.path(context)
+                self.log('Deleting <{}> at \'{}\'.', output.name, loc)
                 output._delete(context)
+                if catalog is not None:
+                    catalog.forget(loc)
+
+    def backfill(self, partitions, task=None, **context):
+        '''
+        Produces all missing partitions of partitioned outputs in one (parallel) run. Existing partitions are
+        discovered with one directory scan per output.
+
+        # Arguments
+        partitions (dict): a single context key (the partition placeholder) with a list of requested values, e.g.
+            `{'date': [date(2020, 1, 1), date(2020, 1, 2)]}`
+        task (str): only backfill outputs of this task (and anything upstream of it)
+        **context: further context and arguments of `run` (e.g. `workers`)
+        '''
+        if len(partitions) != 1:
+            raise ValueError('Backfill requires exactly one partition key, got {}.'.format(list(partitions)))
+        (key, values), = partitions.items()
+        missing = set()
+        for name in [task] if task else self.dag.tasks:
+            for output in self._outputs(name):
+                if key in output.placeholders():
+                    missing.update(Partitioned(output, key).missing(values, context))
+        missing = [_ for _ in values if _ in missing]
+        if not missing:
+            self.log('Nothing to backfill, all partitions exist.')
+            return
+        self.log('Backfilling {} partitions of <{}>.', len(missing), key)
+        grid = dict(context.pop('grid', None) or {}, **{key: missing})
+        self.run(task=task, grid=grid, **context)
 
-    def undo(self, task=None, downstream=False, **context):
+    def undo(self, task=None, downstream=False, grid=None, **context):
+        '''
+        Deletes the outputs of `task` (and, if `downstream` is true, of its downstream tasks) or of all tasks. With a
+        `grid`, outputs are deleted for every combination of its context values (as `run` would produce them).
+        '''
         context['task'] = task
         context['downstream'] = downstream
-        pretty_context = pprint.pformat(context)
-        pretty_indented_context = '\n'.join(['  ' + _ for _ in pretty_context.split('\n')])
-        self.log('Undoing with context:\n' + pretty_indented_context)
+        if logger.isEnabledFor(logging.INFO):
+            self.log('Undoing with context:\n{}', _indented(pprint.pformat(context)))
         if task and downstream:
             tasks_to_undo = self.get_downstream_tasks(task)
             tasks_to_undo.add(task)
         elif task and not downstream:
             tasks_to_undo = [task]
         else:
-            tasks_to_undo = self.funcs.keys()
-        self.log('Undoing tasks {}.'.format(list(tasks_to_undo)))
-        self.delete_output(tasks_to_undo, context)
+            tasks_to_undo = self.tasks.keys()
+        self.log('Undoing tasks {}.', list(tasks_to_undo))
+        for grid_context in _grid_contexts(context, grid):
+            self.delete_output(tasks_to_undo, grid_context)
 
 
 class PipelineCLI():
@@ -213,6 +1382,7 @@ class PipelineCLI():
     run_parser (argparse.ArgumentParser): handles the `run` sub-command
     dot_parser (argparse.ArgumentParser): handles the `dot` sub-command
     ls_parser (argparse.ArgumentParser): handles the `ls` sub-command
+    serve_parser (argparse.ArgumentParser): handles the `serve` sub-command
     '''
 
     def __init__(self, pipeline):
@@ -223,27 +1393,112 @@ class PipelineCLI():
 
         self.run_parser = self.subparsers.add_parser('run', help='run the pipeline')
         self.run_parser.add_argument('-t', '--task', help='run/undo a specific task')
+        self.run_parser.add_argument('-w', '--workers', type=int, default=1,
+                                     help='the maximum number of tasks to run at the same time')
+        self.run_parser.add_argument('-b', '--backend', choices=BACKENDS, default='thread',
+                                     help='the type of worker pool used if workers > 1')
+        self.run_parser.add_argument('--cache-size', default=None,
+                                     help='hand results to consumers in memory, using at most this many bytes '
+                                          '(e.g. 512M or 2G)')
+        self.run_parser.add_argument('--fingerprint', choices=FINGERPRINTS, default='mtime',
+                                     help='how to detect stale outputs (default: mtime)')
+        self.run_parser.add_argument('--assertions', choices=ASSERTION_POLICIES, default='cheap',
+                                     help='which resource assertions to run when loading outputs that passed them '
+                                          'when saved (default: cheap)')
+        self.run_parser.add_argument('--profile', default=None, metavar='PATH',
+                                     help='write a JSON profile (and Chrome trace) of the run to PATH')
+        self.run_parser.add_argument('-g', '--grid', action='append', default=None, metavar='KEY=VALUES',
+                                     help='sweep over values of a context key, e.g. clusters=2..20 or k=1,2,4 '
+                                          '(repeat for a grid)')
+        self.run_parser.add_argument('--distributed', action='store_true',
+                                     help='claim tasks with lock files, so that several runs can share the DAG')
+        self.run_parser.add_argument('--catalog', default=None, metavar='PATH',
+                                     help='record outputs in a SQLite catalog at PATH and use it to check existence')
+        self.run_parser.add_argument('--verify', action='store_true',
+                                     help='check outputs and fingerprints recorded in the catalog anyway')
+        self.run_parser.add_argument('--memory', default=None, metavar='SIZE',
+                                     help='limit the sum of declared memory of tasks running at the same time, '
+                                          'e.g. 64G')
+        self.run_parser.add_argument('--cpus', type=int, default=None,
+                                     help='limit the sum of declared CPU slots of tasks running at the same time')
+        self.run_parser.add_argument('--shared-memory', action='store_true',
+                                     help='hand results over in shared memory with the process backend')
+        self.run_parser.add_argument('--prefetch', action='store_true',
+                                     help='load available inputs of consumers while their producers run')
+        self.run_parser.add_argument('--write-behind', type=int, default=0, metavar='THREADS',
+                                     help='save outputs on this many background threads (default: 0, i.e. off)')
 
         self.dot_parser = self.subparsers.add_parser('dot', help='create a graphviz dot file of the DAG')
 
         self.ls_parser = self.subparsers.add_parser('ls', help='list pipeline tasks')
 
-    def run(self, external_context={}):
+        self.serve_parser = self.subparsers.add_parser('serve', help='serve commands from a long-lived process, '
+                                                                     'see python -m dalymi')
+        self.serve_parser.add_argument('-s', '--socket', default=DEFAULT_SOCKET,
+                                       help='the Unix socket to listen on (default: {})'.format(DEFAULT_SOCKET))
+        self.serve_parser.add_argument('--warm-cache', default='1G', metavar='SIZE',
+                                       help='keep loaded and saved resources in memory across runs, using at most '
+                                            'this many bytes (default: 1G)')
+
+    def run(self, external_context={}, argv=None):
         '''
-        Parses arguments and runs the provided command.
+        Parses arguments (`argv`, by default the command line arguments) and runs the provided command.
         '''
-        undo_parser = self.subparsers.add_parser('undo', parents=[self.run_parser], add_help=False,
-                                                 description='undo tasks')
-        undo_parser.add_argument('-d', '--downstream', action='store_true', help='undo downstream tasks')
-        args = self.parser.parse_args()
+        if 'undo' not in self.subparsers.choices:
+            self._add_commands()
+        args = self.parser.parse_args(argv)
+        types = {_.dest: _.type for _ in self.run_parser._actions if _.type is not None}
+        try:
+            if getattr(args, 'grid', None):
+                args.grid = parse_grid(args.grid, types)
+            if getattr(args, 'partitions', None):
+                args.partitions = parse_grid([args.partitions], types)
+        except ValueError as e:
+            self.parser.error(str(e))
+        if args.command == 'status' and not args.catalog:
+            self.parser.error('the status command requires --catalog')
         context = {**external_context, **vars(args)}
         if args.command == 'run':
             self.pipeline.run(**context)
         elif args.command == 'undo':
             self.pipeline.undo(**context)
+        elif args.command == 'plan':
+            self.pipeline.plan(**context)
+        elif args.command == 'backfill':
+            self.pipeline.backfill(**context)
+        elif args.command == 'status':
+            self.pipeline.status(**context)
+        elif args.command == 'gc':
+            self.pipeline.gc(**context)
         elif args.command == 'dot':
             self.pipeline.dot()
         elif args.command == 'ls':
             self.pipeline.ls()
+        elif args.command == 'serve':
+            Server(self, args.socket, args.warm_cache, external_context).serve()
         else:
             self.parser.print_help()
+
+    def _add_commands(self):
+        '''
+        Adds the sub-commands sharing the arguments of the `run` sub-command (including those added after
+        initialization).
+        '''
+        undo_parser = self.subparsers.add_parser('undo', parents=[self.run_parser], add_help=False,
+                                                 description='undo tasks')
+        undo_parser.add_argument('-d', '--downstream', action='store_true', help='undo downstream tasks')
+        self.subparsers.add_parser('plan', parents=[self.run_parser], add_help=False,
+                                   description='list the tasks a run would execute, without executing them')
+        gc_parser = self.subparsers.add_parser('gc', parents=[self.run_parser], add_help=False,
+                                               description='evict intermediate outputs to meet a disk budget')
+        gc_parser.add_argument('--budget', required=True, help='the disk budget, e.g. 100G')
+        gc_parser.add_argument('--policy', choices=GC_POLICIES, default='lru',
+                               help='evict least recently used outputs or those cheapest to recompute first '
+                                    '(default: lru)')
+        gc_parser.add_argument('--dry-run', action='store_true', help='only list the outputs to evict')
+        self.subparsers.add_parser('status', parents=[self.run_parser], add_help=False,
+                                   description='report outputs recorded in the catalog, without accessing them')
+        backfill_parser = self.subparsers.add_parser('backfill', parents=[self.run_parser], add_help=False,
+                                                     description='produce missing partitions in parallel')
+        backfill_parser.add_argument('-p', '--partitions', required=True, metavar='KEY=VALUES',
+                                     help='the requested partitions, e.g. date=2020-01-01..2020-01-31')
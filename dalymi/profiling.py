@@ -0,0 +1,126 @@
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+# Per-thread CPU time is only available in Python >= 3.7:
+cpu_time = getattr(time, 'thread_time', time.process_time)
+
+
+class Profiler:
+    '''
+    Records spans of pipeline activity: task computations (`'task'`), resource loads (`'load'`) and saves (`'save'`).
+    Each span records wall time, CPU time, peak memory and, for loads and saves, bytes read or written.
+
+    Peak memory is measured with `tracemalloc` and hence covers allocations reported to Python (including `numpy`
+    and `pandas` data). Since `tracemalloc` is process-wide, peak memory is approximate if tasks run concurrently.
+    '''
+
+    def __init__(self):
+        self.spans = []
+        self._active = 0
+        self._lock = threading.Lock()
+        self._start = None
+        self._tracing = False
+
+    def start(self):
+        self._start = time.perf_counter()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def stop(self):
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    @contextmanager
+    def span(self, category, name, task):
+        '''
+        A context manager recording a span. Yields a dictionary to which additional arguments (e.g. `bytes`) can be
+        added.
+        '''
+        args = {'task': task}
+        with self._lock:
+            if self._active == 0 and hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self._active += 1
+        memory_start = tracemalloc.get_traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = cpu_time()
+        try:
+            yield args
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = cpu_time() - cpu_start
+            peak = tracemalloc.get_traced_memory()[1]
+            with self._lock:
+                self._active -= 1
+                self.spans.append({
+                    'category': category,
+                    'name': name,
+                    'start': wall_start - self._start,
+                    'wall_time': wall,
+                    'cpu_time': cpu,
+                    'peak_memory': max(0, peak - memory_start),
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                    'args': args,
+                })
+
+    def summary(self):
+        '''
+        Returns totals per task and per resource as a dictionary with keys `'tasks'` and `'resources'`.
+        '''
+        tasks = {}
+        resources = {}
+        for span in self.spans:
+            task = tasks.setdefault(span['args']['task'], {
+                'wall_time': 0., 'cpu_time': 0., 'peak_memory': 0, 'compute_time': 0., 'load_time': 0.,
+                'save_time': 0., 'bytes_read': 0, 'bytes_written': 0})
+            task['wall_time'] += span['wall_time']
+            task['cpu_time'] += span['cpu_time']
+            task['peak_memory'] = max(task['peak_memory'], span['peak_memory'])
+            task['{}_time'.format('compute' if span['category'] == 'task' else span['category'])] += span['wall_time']
+            if span['category'] == 'task':
+                continue
+            resource = resources.setdefault(span['name'], {
+                'loads': 0, 'saves': 0, 'load_time': 0., 'save_time': 0., 'bytes_read': 0, 'bytes_written': 0})
+            nbytes = span['args'].get('bytes') or 0
+            if span['category'] == 'load':
+                resource['loads'] += 1
+                resource['load_time'] += span['wall_time']
+                resource['bytes_read'] += nbytes
+                task['bytes_read'] += nbytes
+            else:
+                resource['saves'] += 1
+                resource['save_time'] += span['wall_time']
+                resource['bytes_written'] += nbytes
+                task['bytes_written'] += nbytes
+        return {'tasks': tasks, 'resources': resources}
+
+    def trace_events(self):
+        '''
+        Returns the recorded spans as complete events ("ph": "X") of the Chrome trace-event format.
+        '''
+        events = []
+        for span in self.spans:
+            args = dict(span['args'], cpu_time=span['cpu_time'], peak_memory=span['peak_memory'])
+            events.append({'name': span['name'], 'cat': span['category'], 'ph': 'X', 'pid': span['pid'],
+                           'tid': span['tid'], 'ts': span['start'] * 1e6, 'dur': span['wall_time'] * 1e6,
+                           'args': args})
+        return events
+
+    def export(self, path):
+        '''
+        Writes the summary and the trace events to a JSON file at `path`. The file can be loaded directly into trace
+        viewers like `chrome://tracing` or Perfetto.
+        '''
+        profile = self.summary()
+        profile['traceEvents'] = self.trace_events()
+        profile['displayTimeUnit'] = 'ms'
+        with open(path, 'w') as f:
+            json.dump(profile, f, indent=2, default=str)
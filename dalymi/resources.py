@@ -1,37 +1,202 @@
+import asyncio
+import copy
+import glob
+import hashlib
+import io
+import json
+import mmap
 import os.path
 import pickle
+import re
+import string
+import uuid
+import warnings
+
+from .aio import offload
+from .assertions import cheap, is_cheap, label
+from .utils import placeholders
 
 
 class Resource:
 
+    # Chunked resources load as iterators of chunks and save iterables (e.g. generators) of chunks:
+    chunked = False
+
     def __init__(self, name=None, loc=None, assertions=[]):
         self.name = name
         self.loc = loc
         self.assertions = assertions
 
+    @property
+    def cacheable(self):
+        '''
+        Whether loaded or saved data of this resource may be handed over in memory.
+        '''
+        return not self.chunked
+
+    @property
+    def inline(self):
+        '''
+        Whether the asynchronous methods of this resource only offload its synchronous ones to threads, so that the
+        pipeline may call them inline when there is nothing to run concurrently (see `aio.run_inline`). False for
+        resources with native `asyncio` implementations of `acheck`, `aload` or `asave`.
+        '''
+        cls = type(self)
+        return cls.acheck is Resource.acheck and cls.aload is Resource.aload and cls.asave is Resource.asave
+
+    def placeholders(self):
+        '''
+        Returns the set of context keys used to format the location of this resource.
+        '''
+        return placeholders(self.loc)
+
+    def path(self, context):
+        '''
+        Returns the location of this resource for `context`.
+        '''
+        return self.loc.format_map(context)
+
     def _check(self, context):
-        path = self.loc.format(**context)
+        path = self.path(context)
         return self.check(path)
 
+    def _missing(self, context):
+        '''
+        Returns a list of contexts to run the producer of this resource with to make it available for `context`.
+        '''
+        return [] if self._check(context) else [context]
+
     def _delete(self, context):
-        path = self.loc.format(**context)
+        path = self.path(context)
         self.delete(path)
 
     def _load(self, context):
-        path = self.loc.format(**context)
+        path = self.path(context)
         data = self.load(path)
-        self.assert_integrity(data)
+        if self.chunked:
+            return self._assert_chunks(data)
+        self._assert_loaded(data, path, context)
         return data
 
     def _save(self, data, context):
-        self.assert_integrity(data)
-        path = self.loc.format(**context)
+        if self.chunked:
+            data = self._assert_chunks(data)
+        else:
+            self.assert_integrity(data)
+        path = self.path(context)
+        self._write(path, data)
+        if not self.chunked:
+            self._record_assertions(path)
+
+    def _write(self, path, data):
         self.save(path, data)
 
+    async def _acheck(self, context):
+        path = self.path(context)
+        return await self.acheck(path)
+
+    async def _amissing(self, context):
+        return [] if await self._acheck(context) else [context]
+
+    async def _aload(self, context):
+        path = self.path(context)
+        data = await self.aload(path)
+        if self.chunked:
+            return self._assert_chunks(data)
+        await offload(self._assert_loaded, data, path, context)
+        return data
+
+    async def _asave(self, data, context):
+        if self.chunked:
+            data = self._assert_chunks(data)
+        else:
+            await offload(self.assert_integrity, data)
+        path = self.path(context)
+        await self._awrite(path, data)
+        if not self.chunked:
+            await offload(self._record_assertions, path)
+
+    async def _awrite(self, path, data):
+        await self.asave(path, data)
+
+    def _assert_loaded(self, data, path, context):
+        '''
+        Runs the assertions on `data` loaded from `path`, except those which passed for its unchanged content already
+        (depending on the assertion policy in `context`, see `dalymi.assertions`).
+        '''
+        policy = context.get('assertions', 'cheap')
+        passed = self._passed_assertions(path) if policy != 'strict' and self.assertions else set()
+        for assertion in self.assertions:
+            if label(assertion) not in passed or (policy == 'cheap' and is_cheap(assertion)):
+                assertion(data)
+
+    def _passed_assertions(self, path):
+        '''
+        Returns the labels of assertions recorded as passed for the current content of the resource at `path`. The
+        content is unchanged if its stamp or, failing that, its content hash (if recorded) is the recorded one.
+        '''
+        meta = self.read_meta(path)
+        record = meta.get('assertions') if meta else None
+        if not record:
+            return set()
+        if record['stamp'] != self.stamp(path) and (record.get('content') is None or
+                                                    record['content'] != self.stamp(path, content=True)):
+            return set()
+        return set(record['passed'])
+
+    def _record_assertions(self, path):
+        '''
+        Records the assertions which passed when saving the resource at `path`, together with its stamps. The content
+        hash is only computed if a recorded assertion is not cheap (cheap ones run on each load by default anyway).
+        '''
+        recorded = [_ for _ in self.assertions if label(_) is not None]
+        stamp = self.stamp(path) if recorded else None
+        if stamp is None:
+            return
+        content = self.stamp(path, content=True) if not all(is_cheap(_) for _ in recorded) else None
+        meta = self.read_meta(path) or {}
+        meta['assertions'] = {'stamp': stamp, 'content': content, 'passed': [label(_) for _ in recorded]}
+        self.write_meta(path, meta)
+
+    def _assert_chunks(self, chunks):
+        for chunk in chunks:
+            self.assert_integrity(chunk)
+            yield chunk
+
+    def _stamp(self, context, content=False):
+        path = self.path(context)
+        return self.stamp(path, content=content)
+
+    def _size(self, context):
+        path = self.path(context)
+        return self.size(path)
+
+    def _read_meta(self, context):
+        path = self.path(context)
+        return self.read_meta(path)
+
+    def _evicted(self, context):
+        '''
+        Returns the record of an eviction of this resource by garbage collection (or `None`).
+        '''
+        meta = self._read_meta(context)
+        return meta.get('evicted') if meta else None
+
+    def _write_meta(self, context, meta):
+        path = self.path(context)
+        self.write_meta(path, meta)
+
     def assert_integrity(self, data):
         for assertion in self.assertions:
             assertion(data)
 
+    def adapt(self, data):
+        '''
+        Converts `data` handed over in memory (e.g. by the in-memory cache) to what `load` would return for this
+        resource object. Returns `data` unchanged by default.
+        '''
+        return data
+
     def check(self, path):
         msg = 'Could not *check* resource <{}> (and possibly others), '.format(self.name)
         msg += 'because the resource class has no implementation of the `check` method.'
@@ -52,11 +217,89 @@ class Resource:
         msg += 'because the resource class has no implementation of the `save` method.'
         raise NotImplementedError(msg)
 
+    def load_from(self, path, start):
+        '''
+        Loads the rows of the resource at `path` from row `start` on (see `Delta`). Loads all data and drops the first
+        `start` rows by default. Formats which can skip rows cheaply should override this.
+        '''
+        data = self.load(path)
+        return data.iloc[start:] if hasattr(data, 'iloc') else data[start:]
+
+    def digest(self, path, rows):
+        '''
+        Returns a hash of the first `rows` rows of the resource at `path` (see `Delta`). Loads all data by default.
+        Formats which can read the first rows cheaply should override this.
+        '''
+        data = self.load(path)
+        return _digest(data.iloc[:rows] if hasattr(data, 'iloc') else data[:rows])
+
+    def append(self, path, data):
+        '''
+        Appends `data` to the resource at `path` (see `Appended`). By default, the existing data is loaded, combined
+        with `data` (`pandas.concat` for data frames, `+` otherwise) and saved again. Formats which can append in place
+        should override this.
+        '''
+        existing = self.load(path)
+        if hasattr(existing, 'columns'):
+            import pandas as pd  # importing pandas here to avoid general dependency on it
+            combined = pd.concat([existing, data], ignore_index=True)
+        else:
+            combined = existing + data
+        self._write(path, combined)
+
+    async def acheck(self, path):
+        '''
+        Asynchronous version of `check`. Runs `check` in a thread by default. Override this (and `aload`, `asave`)
+        with native `asyncio` implementations for resources on high-latency storage.
+        '''
+        return await offload(self.check, path)
+
+    async def aload(self, path):
+        '''
+        Asynchronous version of `load`. Runs `load` in a thread by default.
+        '''
+        return await offload(self.load, path)
+
+    async def asave(self, path, data):
+        '''
+        Asynchronous version of `save`. Runs `save` in a thread by default.
+        '''
+        return await offload(self.save, path, data)
+
+    def stamp(self, path, content=False):
+        '''
+        Returns a string identifying the current state of the resource at `path` (or `None` if unsupported).
+        If `content` is true, the stamp must only change if the content changes.
+        '''
+        return None
+
+    def size(self, path):
+        '''
+        Returns the storage size of the resource at `path` in bytes (or `None` if unknown).
+        '''
+        return None
+
+    def read_meta(self, path):
+        '''
+        Returns the metadata dictionary recorded for the resource at `path` (or `None` if there is none).
+        '''
+        return None
+
+    def write_meta(self, path, meta):
+        '''
+        Records a (JSON-serializable) metadata dictionary for the resource at `path`. Ignored if unsupported.
+        '''
+        pass
+
 
 class LocalFileMixin:
     '''
     Provides default `check` and `delete` methods for local file resources.
     Inherit from this before other resource classes to avoid `NotImplementedError`.
+
+    Saves are atomic: `save` writes to hidden temporary files in the target directory, which are renamed to their
+    final locations afterwards (the main file last). Hence, a crash never leaves a partial file which `check` would
+    accept.
     '''
     def makedirs(self, path):
         '''
@@ -67,11 +310,145 @@ class LocalFileMixin:
         if dirs:
             os.makedirs(dirs, exist_ok=True)
 
+    def meta_path(self, path):
+        '''
+        Returns the location of the hidden metadata file which accompanies the file at `path`.
+        '''
+        dirname, basename = os.path.split(path)
+        return os.path.join(dirname, '.{}.dalymi'.format(basename))
+
+    def files(self, path):
+        '''
+        Returns the paths of all data files making up the resource at `path`. The main file `path` comes last.
+        Sub-classes storing additional files (e.g. indexes) should override this.
+        '''
+        return [path]
+
+    def temp_path(self, path):
+        '''
+        Returns a hidden, unique temporary location for writing the file at `path`. The file name keeps its
+        extension, so that writers inferring formats from extensions behave the same.
+        '''
+        dirname, basename = os.path.split(path)
+        return os.path.join(dirname, '.tmp-{}-{}'.format(uuid.uuid4().hex[:12], basename))
+
+    def _write(self, path, data):
+        temp = self.temp_path(path)
+        try:
+            self.save(temp, data)
+            self._commit(temp, path)
+        finally:
+            self._discard(temp)
+
+    async def _awrite(self, path, data):
+        temp = self.temp_path(path)
+        try:
+            await self.asave(temp, data)
+            await offload(self._commit, temp, path)
+        finally:
+            await offload(self._discard, temp)
+
+    def _commit(self, temp, path):
+        for source, target in zip(self.files(temp), self.files(path)):
+            if os.path.isfile(source):
+                os.replace(source, target)
+        meta = self.read_meta(path) or {}
+        evicted = meta.pop('evicted', None)
+        if evicted:
+            if self.stamp(path, content=True) == evicted['content']:
+                # Rebuilt identical data: restore the modification time, so that consumers are not stale.
+                os.utime(path, ns=(evicted['mtime_ns'], evicted['mtime_ns']))
+            self.write_meta(path, meta)
+
+    def _discard(self, temp):
+        for file in self.files(temp):
+            if os.path.isfile(file):
+                os.remove(file)
+
+    def discover(self):
+        '''
+        Returns the paths of all existing files matching the location of this resource for any context. Placeholders
+        match any value within a single path component, repeated placeholders the same value.
+        '''
+        pattern = wildcard = ''
+        groups = {}  # keys: (field, spec, conversion), values: group names
+        for literal, field, spec, conversion in string.Formatter().parse(self.loc):
+            pattern += re.escape(literal)
+            wildcard += glob.escape(literal)
+            if field is None:
+                continue
+            wildcard += '*'
+            if (field, spec, conversion) in groups:
+                pattern += '(?P={})'.format(groups[(field, spec, conversion)])
+            else:
+                groups[(field, spec, conversion)] = 'value{}'.format(len(groups))
+                pattern += '(?P<{}>[^/]+)'.format(groups[(field, spec, conversion)])
+        regex = re.compile(pattern)
+        return sorted(_ for _ in glob.glob(wildcard) if regex.fullmatch(_.replace(os.sep, '/')))
+
     def check(self, path):
         return os.path.isfile(path)
 
     def delete(self, path):
-        return os.remove(path)
+        meta_path = self.meta_path(path)
+        if os.path.isfile(meta_path):
+            os.remove(meta_path)
+        for file in self.files(path):
+            if os.path.isfile(file):
+                os.remove(file)
+
+    def evict(self, path):
+        '''
+        Deletes the data files of the resource at `path`, but keeps its metadata and records its stamps in it. If the
+        resource is rebuilt with identical content, it regains its previous modification time. Until then, `stamp`
+        returns the recorded stamps.
+        '''
+        meta = self.read_meta(path) or {}
+        stat = os.stat(path)
+        meta['evicted'] = {'mtime': self.stamp(path), 'content': self.stamp(path, content=True),
+                           'mtime_ns': stat.st_mtime_ns}
+        self.write_meta(path, meta)
+        for file in self.files(path):
+            if os.path.isfile(file):
+                os.remove(file)
+
+    def stamp(self, path, content=False):
+        '''
+        Returns the modification time and size of the file at `path` or, if `content` is true, the SHA-256 hash of
+        all its files. Returns the stamps recorded by `evict` for evicted files.
+        '''
+        if not os.path.isfile(path):
+            evicted = (self.read_meta(path) or {}).get('evicted')
+            return evicted['content' if content else 'mtime'] if evicted else None
+        if content:
+            digest = hashlib.sha256()
+            for file in self.files(path):
+                if os.path.isfile(file):
+                    with open(file, 'rb') as f:
+                        for block in iter(lambda: f.read(2**20), b''):
+                            digest.update(block)
+            return digest.hexdigest()
+        stat = os.stat(path)
+        return '{}:{}'.format(stat.st_mtime_ns, stat.st_size)
+
+    def size(self, path):
+        if not os.path.isfile(path):
+            return None
+        return sum(os.path.getsize(_) for _ in self.files(path) if os.path.isfile(_))
+
+    def read_meta(self, path):
+        try:
+            with open(self.meta_path(path), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_meta(self, path, meta):
+        meta_path = self.meta_path(path)
+        temp = self.temp_path(meta_path)
+        with open(temp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp, meta_path)
 
 
 class PandasDF(Resource):
@@ -80,38 +457,662 @@ class PandasDF(Resource):
         assertions = [self.assert_columns] + assertions
         super().__init__(name=name, loc=loc, assertions=assertions)
         self.columns = columns
+        self.selected = None
 
+    @cheap
     def assert_columns(self, df):
-        if self.columns is not None:
-            assert set(df.columns) == set(self.columns), \
+        expected = self.columns if self.selected is None else self.selected
+        if expected is not None:
+            assert set(df.columns) == set(expected), \
                 'Columns of resource <{}> do not match expected. '.format(self.name) \
-                + 'Present: {}. Expected: {}.'.format(set(df.columns, set(self.columns)))
+                + 'Present: {}. Expected: {}.'.format(set(df.columns), set(expected))
+
+    def select(self, columns):
+        '''
+        Returns a copy of this resource which only loads the given `columns`. Use it as task input to avoid loading
+        unused columns, e.g. `@pl.input(prepared.select(['sepal_length']))`. Where the file format allows it, the
+        selection is pushed down into the reader.
+        '''
+        resource = copy.copy(self)
+        resource.selected = list(columns)
+        resource.assertions = [resource.assert_columns if _ == self.assert_columns else _ for _ in self.assertions]
+        return resource
+
+    def adapt(self, data):
+        return data if self.selected is None else data[self.selected]
 
 
 class PandasCSV(LocalFileMixin, PandasDF):
+    '''
+    A `pandas.DataFrame` stored as CSV file.
 
-    def __init__(self, name=None, loc=None, columns=None, assertions=[]):
+    # Arguments
+    chunksize (int): if given, the resource is chunked: it loads as an iterator of data frames with `chunksize` rows
+        each and saves any iterable of data frames (e.g. a generator returned by a task) chunk by chunk.
+    '''
+
+    def __init__(self, name=None, loc=None, columns=None, assertions=[], chunksize=None):
         PandasDF.__init__(self, name=name, loc=loc, columns=columns, assertions=assertions)
+        self.chunksize = chunksize
+        self.chunked = chunksize is not None
 
     def load(self, path):
         import pandas as pd  # importing pandas here to avoid general dependency on it
-        return pd.read_csv(path)
+        if self.chunked:
+            return self._read_chunks(pd, path)
+        df = pd.read_csv(path, usecols=self.selected)
+        return df if self.selected is None else df[self.selected]
+
+    def load_from(self, path, start):
+        import pandas as pd
+        df = pd.read_csv(path, usecols=self.selected, skiprows=range(1, start + 1))
+        return df if self.selected is None else df[self.selected]
+
+    def digest(self, path, rows):
+        import pandas as pd
+        return _digest(pd.read_csv(path, usecols=self.selected, nrows=rows))
+
+    def append(self, path, data):
+        '''
+        Appends the rows of `data` to the file in place. If writing fails, the file is truncated to its previous
+        length (so that a failed append never leaves a partially written row).
+        '''
+        import pandas as pd
+        columns = pd.read_csv(path, nrows=0).columns  # appended rows follow the existing header
+        length = os.path.getsize(path)
+        try:
+            data[list(columns)].to_csv(path, mode='a', header=False, index=False)
+        except BaseException:
+            with open(path, 'r+b') as f:
+                f.truncate(length)
+            raise
+
+    def _read_chunks(self, pd, path):
+        reader = pd.read_csv(path, usecols=self.selected, chunksize=self.chunksize)
+        try:
+            for df in reader:
+                yield df if self.selected is None else df[self.selected]
+        finally:
+            reader.close()
+
+    def save(self, path, data):
+        self.makedirs(path)
+        if not self.chunked:
+            return data.to_csv(path, index=False)
+        with open(path, 'w', newline='') as f:
+            header = True
+            for df in data:
+                df.to_csv(f, index=False, header=header)
+                header = False
+            if header and self.columns is not None:
+                f.write(','.join(self.columns) + '\n')
+
+
+class PandasParquet(LocalFileMixin, PandasDF):
+    '''
+    A `pandas.DataFrame` stored as Apache Parquet file. Requires `pyarrow`.
+
+    Column selections (see `PandasDF.select`) are read from the file exclusively. Files are memory-mapped while
+    being read.
+
+    # Arguments
+    compression (str): the codec used to compress column chunks, e.g. `'snappy'`, `'zstd'`, `'gzip'` or `'none'`
+    '''
+
+    def __init__(self, name=None, loc=None, columns=None, assertions=[], compression='snappy'):
+        PandasDF.__init__(self, name=name, loc=loc, columns=columns, assertions=assertions)
+        self.compression = compression
+
+    def load(self, path):
+        import pyarrow.parquet as pq  # importing pyarrow here to avoid general dependency on it
+        table = pq.read_table(path, columns=self.selected, memory_map=True)
+        return table.to_pandas(split_blocks=True)
+
+    def save(self, path, data):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.makedirs(path)
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        pq.write_table(table, path, compression=self.compression)
+
+
+class PandasFeather(LocalFileMixin, PandasDF):
+    '''
+    A `pandas.DataFrame` stored as Feather (Apache Arrow IPC) file. Requires `pyarrow`.
+
+    Column selections (see `PandasDF.select`) are read from the file exclusively. Files are memory-mapped, so that
+    uncompressed files load without copying where the data types allow it.
+
+    # Arguments
+    compression (str): `'uncompressed'` (default, allows zero-copy loads), `'lz4'` or `'zstd'`
+    '''
+
+    def __init__(self, name=None, loc=None, columns=None, assertions=[], compression='uncompressed'):
+        PandasDF.__init__(self, name=name, loc=loc, columns=columns, assertions=assertions)
+        self.compression = compression
+
+    def load(self, path):
+        import pyarrow.feather as feather  # importing pyarrow here to avoid general dependency on it
+        table = feather.read_table(path, columns=self.selected, memory_map=True)
+        return table.to_pandas(split_blocks=True)
 
     def save(self, path, data):
+        import pyarrow.feather as feather
         self.makedirs(path)
-        return data.to_csv(path, index=False)
+        feather.write_feather(data.reset_index(drop=True), path, compression=self.compression)
+
+
+def _open_gzip(path, mode):
+    import gzip
+    return gzip.open(path, mode)
+
+
+def _open_bz2(path, mode):
+    import bz2
+    return bz2.open(path, mode)
+
+
+def _open_lzma(path, mode):
+    import lzma
+    return lzma.open(path, mode)
+
+
+def _open_zstd(path, mode):
+    import zstandard
+    f = zstandard.open(path, mode)
+    # zstandard readers do not implement `readline`, which unpickling may require:
+    return io.BufferedReader(f) if 'r' in mode else f
+
+
+def _open_lz4(path, mode):
+    import lz4.frame
+    return lz4.frame.open(path, mode)
+
+
+# keys: compression names, values: (magic bytes, function to open a file object)
+COMPRESSIONS = {
+    'gzip': (b'\x1f\x8b', _open_gzip),
+    'bz2': (b'BZh', _open_bz2),
+    'lzma': (b'\xfd7zXZ\x00', _open_lzma),
+    'zstd': (b'\x28\xb5\x2f\xfd', _open_zstd),
+    'lz4': (b'\x04\x22\x4d\x18', _open_lz4),
+}
+
+# Fast codecs requiring third-party packages, with their packages:
+FAST_COMPRESSIONS = {'zstd': 'zstandard', 'lz4': 'lz4'}
+
+
+def open_compressed(path, mode, compression=None):
+    '''
+    Opens a binary file object at `path`. When writing, data is compressed with `compression` (see `COMPRESSIONS`,
+    `None` for no compression). When reading, the compression is detected from the first bytes of the file.
+    '''
+    if 'r' in mode:
+        with open(path, 'rb') as f:
+            head = f.read(6)
+        compression = next((name for name, (magic, _) in COMPRESSIONS.items() if head.startswith(magic)), None)
+    if compression is None:
+        return open(path, mode)
+    return COMPRESSIONS[compression][1](path, mode)
 
 
 class Pickle(LocalFileMixin, Resource):
+    '''
+    Any picklable object stored as pickle file.
 
-    def __init__(self, name=None, loc=None, assertions=[]):
+    # Arguments
+    chunked (bool): if true, the resource saves any iterable (e.g. a generator returned by a task) as a stream of
+        pickled chunks and loads as an iterator over these chunks.
+    protocol (int): the pickle protocol (default: `pickle.DEFAULT_PROTOCOL`, or 5 with `out_of_band`)
+    compression (str): `'zstd'` or `'lz4'` (fast, requiring `zstandard` or `lz4`, falling back to `'gzip'` if
+        those are not installed), `'gzip'`, `'bz2'` or `'lzma'`. Compressed files are detected automatically when
+        loading.
+    out_of_band (bool): if true, large buffers (e.g. `numpy` arrays) are stored uncompressed next to the pickle
+        (in `<loc>.buffers`) and memory-mapped when loading instead of being copied. Requires Python >= 3.8.
+    '''
+
+    alignment = 64  # byte alignment of out-of-band buffers
+
+    def __init__(self, name=None, loc=None, assertions=[], chunked=False, protocol=None, compression=None,
+                 out_of_band=False):
         Resource.__init__(self, name=name, loc=loc, assertions=assertions)
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError('Unknown compression \'{}\'. Choose one of {}.'.format(compression, list(COMPRESSIONS)))
+        if compression in FAST_COMPRESSIONS:
+            try:
+                __import__(FAST_COMPRESSIONS[compression])
+            except ImportError:
+                warnings.warn('Package `{}` is not installed, resource <{}> falls back to gzip compression.'
+                              .format(FAST_COMPRESSIONS[compression], name))
+                compression = 'gzip'
+        if out_of_band:
+            if pickle.HIGHEST_PROTOCOL < 5:
+                raise ValueError('Out-of-band buffers require pickle protocol 5 (Python >= 3.8).')
+            if chunked:
+                raise ValueError('Out-of-band buffers are not supported for chunked resources.')
+            protocol = 5 if protocol is None else protocol
+            if protocol < 5:
+                raise ValueError('Out-of-band buffers require pickle protocol 5, got {}.'.format(protocol))
+        self.chunked = chunked
+        self.protocol = protocol
+        self.compression = compression
+        self.out_of_band = out_of_band
+
+    def buffers_path(self, path):
+        return '{}.buffers'.format(path)
+
+    def files(self, path):
+        return [self.buffers_path(path), path] if self.out_of_band else [path]
 
     def load(self, path):
+        if self.chunked:
+            return self._read_chunks(path)
+        with open_compressed(path, 'rb') as f:
+            data = pickle.load(f)
+        if not self.out_of_band:
+            return data
+        offsets, payload = data
+        return pickle.loads(payload, buffers=self._map_buffers(self.buffers_path(path), offsets))
+
+    def _read_chunks(self, path):
+        with open_compressed(path, 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def _map_buffers(self, path, offsets):
+        if not offsets:
+            return []
         with open(path, 'rb') as f:
-            return pickle.load(f)
+            if os.fstat(f.fileno()).st_size == 0:  # only empty buffers, which can not be mapped
+                return [memoryview(bytearray(length)) for _, length in offsets]
+            # copy-on-write, so that loaded arrays are writable without changing the file:
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY))
+        return [view[offset:offset + length] for offset, length in offsets]
+
+    def _write_buffers(self, path, buffers):
+        offsets = []
+        with open(path, 'wb') as f:
+            for buffer in buffers:
+                raw = buffer.raw()
+                padding = -f.tell() % self.alignment
+                f.write(b'\0' * padding)
+                offsets.append((f.tell(), raw.nbytes))
+                f.write(raw)
+        return offsets
 
     def save(self, path, data):
         self.makedirs(path)
-        with open(path, 'wb') as f:
-            pickle.dump(data, f)
+        if self.out_of_band:
+            buffers = []
+            payload = pickle.dumps(data, protocol=self.protocol, buffer_callback=buffers.append)
+            data = (self._write_buffers(self.buffers_path(path), buffers), payload)
+        with open_compressed(path, 'wb', self.compression) as f:
+            if not self.chunked:
+                pickle.dump(data, f, protocol=self.protocol)
+                return
+            for chunk in data:
+                pickle.dump(chunk, f, protocol=self.protocol)
+
+
+class Partitioned(Resource):
+    '''
+    All partitions of a resource whose location contains the placeholder `{<key>}`, e.g. `Partitioned(events, 'date')`
+    for `events` with `loc='data/date={date}/events.csv'`. Use it as task input to load a range of partitions as a
+    single input. The underlying resource is used as output of the task producing single partitions.
+
+    Existing partitions of local files are discovered with a single directory scan.
+
+    # Arguments
+    resource (Resource): the partitioned resource
+    key (str): the context key identifying partitions
+    values (callable): returns the partition values to load for a given context (e.g. a date range). If omitted,
+        all existing partitions are loaded. Missing partitions are produced before the consuming task runs.
+    combine (callable): combines the list of loaded partitions into a single input. By default, data frames are
+        concatenated with `pandas.concat` and other data are passed on as list.
+    '''
+
+    def __init__(self, resource, key, values=None, combine=None):
+        if key not in resource.placeholders():
+            raise ValueError('Location \'{}\' of resource <{}> has no placeholder {{{}}}.'
+                             .format(resource.loc, resource.name, key))
+        if resource.chunked:
+            raise ValueError('Partitions of chunked resource <{}> can not be combined.'.format(resource.name))
+        Resource.__init__(self, name=resource.name, loc=resource.loc)
+        self.resource = resource
+        self.key = key
+        self.values = values
+        self.combine = combine
+        fields = [_ for _ in string.Formatter().parse(resource.loc) if _[1] and re.split(r'[.\[]', _[1])[0] == key]
+        _, field, spec, conversion = fields[0]
+        self._field = '{' + field + ('!' + conversion if conversion else '') + (':' + spec if spec else '') + '}'
+
+    @property
+    def cacheable(self):
+        return False
+
+    @property
+    def inline(self):
+        return False  # partitions load concurrently
+
+    def placeholders(self):
+        return self.resource.placeholders() - {self.key}
+
+    def format_value(self, value):
+        '''
+        Returns how partition `value` appears in resource locations.
+        '''
+        return self._field.format(**{self.key: value})
+
+    def _pattern(self, context):
+        '''
+        Returns a regular expression matching locations of partitions (with group `partition`) and the formatted
+        location up to the first partition placeholder.
+        '''
+        pattern = text = ''
+        prefix = None
+        for literal, field, spec, conversion in string.Formatter().parse(self.loc):
+            pattern += re.escape(literal)
+            text += literal
+            if not field:
+                continue
+            if re.split(r'[.\[]', field)[0] == self.key:
+                pattern += '(?P<partition>[^/]+)' if prefix is None else '(?P=partition)'
+                prefix = text if prefix is None else prefix
+            else:
+                template = '{' + field + ('!' + conversion if conversion else '') + (':' + spec if spec else '') + '}'
+                formatted = template.format(**context)
+                pattern += re.escape(formatted)
+                text += formatted
+        return re.compile(pattern), prefix
+
+    def scan(self, context):
+        '''
+        Returns a dictionary of all existing partitions (keys: formatted partition values, values: paths). Walks the
+        directory tree below the first partitioned directory once, instead of checking each partition.
+        '''
+        if not isinstance(self.resource, LocalFileMixin):
+            msg = 'Could not discover partitions of resource <{}>, '.format(self.name)
+            msg += 'because only partitions of local files (`LocalFileMixin`) can be discovered.'
+            raise NotImplementedError(msg)
+        regex, prefix = self._pattern(context)
+        root = os.path.dirname(prefix)
+        depth = self.loc.count('/') - root.count('/') if root else self.loc.count('/') + 1
+        found = {}
+        for dirpath, dirnames, filenames in os.walk(root or os.curdir):
+            relative = os.path.relpath(dirpath, root or os.curdir)
+            if (0 if relative == os.curdir else relative.count(os.sep) + 1) >= depth - 1:
+                dirnames[:] = []
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                path = path if root else os.path.relpath(path)
+                match = regex.fullmatch(path.replace(os.sep, '/'))
+                if match:
+                    found[match.group('partition')] = path
+        return found
+
+    def missing(self, values, context):
+        '''
+        Returns those partition `values` which do not exist (yet).
+        '''
+        if isinstance(self.resource, LocalFileMixin):
+            existing = self.scan(context)
+            return [_ for _ in values if self.format_value(_) not in existing]
+        return [_ for _ in values if not self.resource._check(dict(context, **{self.key: _}))]
+
+    def partitions(self, context):
+        '''
+        Returns a list of `(formatted value, path)` tuples of the partitions to load for `context`.
+        '''
+        if self.values is None:
+            return sorted(self.scan(context).items())
+        return [(self.format_value(_), self.path(dict(context, **{self.key: _}))) for _ in self.values(context)]
+
+    def _paths(self, context):
+        return [path for _, path in self.partitions(context)]
+
+    def _check(self, context):
+        return self.values is None or not self.missing(self.values(context), context)
+
+    def _missing(self, context):
+        if self.values is None:
+            return []
+        return [dict(context, **{self.key: _}) for _ in self.missing(self.values(context), context)]
+
+    async def _acheck(self, context):
+        return await offload(self._check, context)
+
+    async def _amissing(self, context):
+        return await offload(self._missing, context)
+
+    def _load(self, context):
+        parts = []
+        for path in self._paths(context):
+            data = self.resource.load(path)
+            self.resource._assert_loaded(data, path, context)
+            parts.append(data)
+        return self._combine(parts)
+
+    async def _aload(self, context):
+        paths = await offload(self._paths, context)
+        parts = await asyncio.gather(*[self.resource.aload(_) for _ in paths])
+        for path, data in zip(paths, parts):
+            await offload(self.resource._assert_loaded, data, path, context)
+        return await offload(self._combine, list(parts))
+
+    def _combine(self, parts):
+        if self.combine is not None:
+            return self.combine(parts)
+        if parts and hasattr(parts[0], 'columns'):
+            import pandas as pd
+            return pd.concat(parts, ignore_index=True)
+        return parts
+
+    def _stamp(self, context, content=False):
+        stamps = [(_, self.resource.stamp(_, content=content)) for _ in self._paths(context)]
+        return hashlib.sha256(json.dumps(stamps).encode()).hexdigest()
+
+    def _size(self, context):
+        sizes = [self.resource.size(_) for _ in self._paths(context)]
+        return sum(_ for _ in sizes if _ is not None)
+
+    def _save(self, data, context):
+        msg = 'Could not *save* resource <{}>, because `Partitioned` resources can only be used as input. '
+        msg += 'Use the underlying resource as output instead.'
+        raise NotImplementedError(msg.format(self.name))
+
+    async def _asave(self, data, context):
+        self._save(data, context)
+
+    def _delete(self, context):
+        msg = 'Could not *delete* resource <{}>, because `Partitioned` resources can only be used as input. '
+        msg += 'Delete the underlying resource instead.'
+        raise NotImplementedError(msg.format(self.name))
+
+
+def _digest(data):
+    '''
+    Returns the SHA-256 hash of the rows of a data frame (including column names) or of the items of a sequence.
+    '''
+    if hasattr(data, 'columns'):
+        import pandas as pd
+        content = json.dumps([str(_) for _ in data.columns]).encode()
+        content += pd.util.hash_pandas_object(data, index=False).values.tobytes()
+    else:
+        content = pickle.dumps(list(data))
+    return hashlib.sha256(content).hexdigest()
+
+
+def _json_value(value):
+    value = value.item() if hasattr(value, 'item') else value  # e.g. `numpy` scalars
+    return value if isinstance(value, (int, float, str, bool)) else str(value)
+
+
+class Delta(Resource):
+    '''
+    The data of a growing resource which the consuming task has not processed yet. Use it as task input (e.g. together
+    with `Appended` outputs) to process only new data. What was processed is recorded as watermark in the metadata of
+    the task's outputs:
+
+    - for `Partitioned` resources, the processed partitions,
+    - with `column`, the maximum value of this column (e.g. a timestamp) of processed rows,
+    - otherwise, the number of processed rows and a hash of these rows (the resource must only ever be appended to).
+
+    If the task's outputs are missing, lack a watermark or changed since it was recorded, the task receives all data.
+    So it does if the processed rows changed (e.g. because the producer of the resource rewrote them).
+
+    # Arguments
+    resource (Resource): the growing resource
+    column (str): if given, rows are processed in order of this column and new rows have higher values
+    '''
+
+    def __init__(self, resource, column=None):
+        if resource.chunked:
+            raise ValueError('Deltas of chunked resource <{}> are not supported.'.format(resource.name))
+        Resource.__init__(self, name=resource.name, loc=resource.loc)
+        self.resource = resource
+        self.column = column
+
+    @property
+    def cacheable(self):
+        return False
+
+    @property
+    def inline(self):
+        return self.resource.inline
+
+    def placeholders(self):
+        return self.resource.placeholders()
+
+    def _check(self, context):
+        return self.resource._check(context)
+
+    def _missing(self, context):
+        return self.resource._missing(context)
+
+    async def _acheck(self, context):
+        return await self.resource._acheck(context)
+
+    async def _amissing(self, context):
+        return await self.resource._amissing(context)
+
+    def _stamp(self, context, content=False):
+        return self.resource._stamp(context, content=content)
+
+    def _size(self, context):
+        return self.resource._size(context)
+
+    def _load(self, context):
+        return self.resource._load(context)
+
+    def _load_delta(self, context, watermark):
+        '''
+        Returns the data beyond `watermark` (all data if `None`) and the new watermark.
+        '''
+        if isinstance(self.resource, Partitioned):
+            processed = set(watermark or [])
+            new = [(value, path) for value, path in self.resource.partitions(context) if value not in processed]
+            parts = []
+            for _, path in new:
+                data = self.resource.resource.load(path)
+                self.resource.resource._assert_loaded(data, path, context)
+                parts.append(data)
+            return self.resource._combine(parts), sorted(processed.union(value for value, _ in new))
+        path = self.path(context)
+        if self.column is None:
+            start = watermark['rows'] if watermark else 0
+            data = self.resource.load_from(path, start)
+            self.resource._assert_loaded(data, path, context)
+            rows = start + len(data)
+            return data, {'rows': rows, 'digest': self.resource.digest(path, rows)}
+        data = self.resource.load(path)
+        if watermark is not None:
+            data = data[data[self.column] > watermark]
+        self.resource._assert_loaded(data, path, context)
+        if not len(data):
+            return data, watermark
+        highest = _json_value(data[self.column].max())
+        return data, highest if watermark is None else max(watermark, highest)
+
+    def _matches(self, watermark, context):
+        '''
+        Returns whether the rows below a row count `watermark` are unchanged (always true for other watermarks).
+        '''
+        if isinstance(self.resource, Partitioned) or self.column is not None:
+            return True
+        if not isinstance(watermark, dict):  # e.g. recorded by older versions without hash
+            return False
+        return self.resource.digest(self.path(context), watermark['rows']) == watermark['digest']
+
+    def _save(self, data, context):
+        msg = 'Could not *save* resource <{}>, because `Delta` resources can only be used as input. '
+        msg += 'Use `Appended` outputs to append data instead.'
+        raise NotImplementedError(msg.format(self.name))
+
+    async def _asave(self, data, context):
+        self._save(data, context)
+
+    def _delete(self, context):
+        self.resource._delete(context)
+
+
+class Appended(Resource):
+    '''
+    Use it as task output to append the returned data to the existing data instead of replacing it. Data is only
+    appended if the task received deltas of all its `Delta` inputs (see `Delta`), otherwise (e.g. on the first run) it
+    replaces the existing data. Consumers use the underlying resource as input.
+
+    # Arguments
+    resource (Resource): the resource to append to
+    '''
+
+    def __init__(self, resource):
+        if resource.chunked:
+            raise ValueError('Appending to chunked resource <{}> is not supported.'.format(resource.name))
+        Resource.__init__(self, name=resource.name, loc=resource.loc, assertions=resource.assertions)
+        self.resource = resource
+
+    @property
+    def cacheable(self):
+        return False  # the returned data is only the appended part
+
+    @property
+    def inline(self):
+        return self.resource.inline
+
+    def check(self, path):
+        return self.resource.check(path)
+
+    def delete(self, path):
+        self.resource.delete(path)
+
+    def load(self, path):
+        return self.resource.load(path)
+
+    def stamp(self, path, content=False):
+        return self.resource.stamp(path, content=content)
+
+    def size(self, path):
+        return self.resource.size(path)
+
+    def read_meta(self, path):
+        return self.resource.read_meta(path)
+
+    def write_meta(self, path, meta):
+        self.resource.write_meta(path, meta)
+
+    def _save(self, data, context):
+        self.resource._save(data, context)
+
+    async def _asave(self, data, context):
+        await self.resource._asave(data, context)
+
+    def _append(self, data, context):
+        self.resource.assert_integrity(data)
+        path = self.path(context)
+        self.resource.append(path, data)
+
+    async def _aappend(self, data, context):
+        await offload(self._append, data, context)
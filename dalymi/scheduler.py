@@ -0,0 +1,170 @@
+from collections import deque
+from concurrent import futures
+import heapq
+import logging
+
+
+BACKENDS = ('thread', 'process')
+
+logger = logging.getLogger(__name__)
+
+
+def _call(func, context):
+    '''
+    Runs a task in a worker. Results are not returned to the scheduler, because they are handed over to consumers
+    via resources (and could be expensive to send between processes).
+    '''
+    func(**context)
+
+
+class Scheduler:
+    '''
+    Executes jobs of a DAG in topological order. Jobs whose dependencies have all finished run at the same time on a
+    pool of workers.
+
+    # Arguments
+    workers (int): the maximum number of jobs running at the same time. With `1`, jobs run one after the other in
+        the calling thread.
+    backend (str): the type of worker pool, either `'thread'` or `'process'`. Tasks run on a process pool must be
+        importable, i.e. be defined at module level.
+    memory (int): if given, the total memory (in bytes) that jobs running at the same time may declare
+    cpus (int): if given, the total number of CPU slots that jobs running at the same time may declare
+    '''
+
+    def __init__(self, workers=1, backend='thread', memory=None, cpus=None):
+        if backend not in BACKENDS:
+            raise ValueError('Unknown backend \'{}\'. Choose one of {}.'.format(backend, BACKENDS))
+        if workers < 1:
+            raise ValueError('The number of workers must be at least 1, got {}.'.format(workers))
+        self.workers = workers
+        self.backend = backend
+        self.memory = memory
+        self.cpus = cpus
+
+    def log(self, message, *args):
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(message.format(*args) if args else message)
+
+    def run(self, jobs, dependencies, requirements=None, costs=None, callback=None):
+        '''
+        Runs all jobs, each one exactly once and only after all of its dependencies have finished.
+
+        With several workers, ready jobs are started in order of their critical path, i.e. the highest total cost of
+        jobs depending on them (directly or indirectly), as long as their declared requirements fit into the limits
+        of the scheduler. A job exceeding the limits on its own runs once no other job is running.
+
+        # Arguments
+        jobs (dict): keys: job keys, values: `(func, context)` tuples
+        dependencies (dict): keys: job keys, values: sets of job keys that have to finish first
+        requirements (dict): keys: job keys, values: `(memory, cpus)` tuples of declared requirements (default:
+            `(0, 1)`)
+        costs (dict): keys: job keys, values: expected durations of jobs (default: `1`)
+        callback (callable): if given, called with the key of each finished job (in the calling thread)
+        '''
+        waiting = {key: len(dependencies.get(key, ())) for key in jobs}
+        dependents = {key: [] for key in jobs}
+        for key in jobs:
+            for dependency in dependencies.get(key, ()):
+                dependents[dependency].append(key)
+        ready = [key for key in jobs if waiting[key] == 0]
+        if self.workers == 1:
+            finished = self._run_sequential(jobs, deque(ready), waiting, dependents, callback)
+        else:
+            priorities = self._critical_paths(jobs, ready, waiting, dependents, costs or {})
+            finished = self._run_parallel(jobs, ready, waiting, dependents, requirements or {}, priorities, callback)
+        if finished < len(jobs):
+            blocked = [key for key in jobs if waiting[key] > 0]
+            raise ValueError('Could not schedule jobs {}, because their dependencies form a cycle.'.format(blocked))
+
+    def _critical_paths(self, jobs, ready, waiting, dependents, costs):
+        '''
+        Returns the total cost of the most expensive chain of jobs starting at each job.
+        '''
+        waiting = dict(waiting)
+        queue = deque(ready)
+        order = []
+        while queue:
+            key = queue.popleft()
+            order.append(key)
+            queue.extend(self._release(key, waiting, dependents))
+        priorities = {key: costs.get(key, 1) for key in jobs}
+        for key in reversed(order):
+            priorities[key] += max((priorities[_] for _ in dependents[key]), default=0)
+        return priorities
+
+    def _release(self, key, waiting, dependents):
+        '''
+        Marks job `key` as finished and returns the jobs that became ready.
+        '''
+        released = []
+        for dependent in dependents[key]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                released.append(dependent)
+        return released
+
+    def _run_sequential(self, jobs, ready, waiting, dependents, callback):
+        finished = 0
+        while ready:
+            key = ready.popleft()
+            func, context = jobs[key]
+            self.log('Attempting function <{}>.', func.__name__)
+            func(**context)
+            finished += 1
+            if callback is not None:
+                callback(key)
+            ready.extend(self._release(key, waiting, dependents))
+        return finished
+
+    def _fits(self, memory, cpus):
+        return (self.memory is None or memory <= self.memory) and (self.cpus is None or cpus <= self.cpus)
+
+    def _run_parallel(self, jobs, ready, waiting, dependents, requirements, priorities, callback):
+        if self.backend == 'process':
+            executor = futures.ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            executor = futures.ThreadPoolExecutor(max_workers=self.workers)
+        counter = iter(range(len(jobs)))  # breaks ties between equal priorities in order of readiness
+        queue = [(-priorities[key], next(counter), key) for key in ready]
+        heapq.heapify(queue)
+        finished = 0
+        running = {}
+        memory = cpus = 0
+        try:
+            while queue or running:
+                deferred = []
+                while queue and len(running) < self.workers:
+                    item = heapq.heappop(queue)
+                    key = item[2]
+                    func, context = jobs[key]
+                    required_memory, required_cpus = requirements.get(key, (0, 1))
+                    if not self._fits(memory + required_memory, cpus + required_cpus):
+                        if running:
+                            deferred.append(item)
+                            continue
+                        self.log('Function <{}> exceeds the resource limits, running it alone.', func.__name__)
+                    self.log('Submitting function <{}>.', func.__name__)
+                    running[executor.submit(_call, func, context)] = key
+                    memory += required_memory
+                    cpus += required_cpus
+                for item in deferred:
+                    heapq.heappush(queue, item)
+                done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    future.result()  # re-raises exceptions of the task
+                    finished += 1
+                    if callback is not None:
+                        callback(key)
+                    required_memory, required_cpus = requirements.get(key, (0, 1))
+                    memory -= required_memory
+                    cpus -= required_cpus
+                    for released in self._release(key, waiting, dependents):
+                        heapq.heappush(queue, (-priorities[released], next(counter), released))
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+        finally:
+            executor.shutdown(wait=True)
+        return finished
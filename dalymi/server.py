@@ -0,0 +1,224 @@
+from contextlib import redirect_stderr, redirect_stdout
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+
+from .cache import WarmCache
+from .utils import parse_size
+
+
+DEFAULT_SOCKET = 'dalymi.sock'
+
+
+class _Connection:
+    '''
+    Sends messages to a client, one JSON object per line. Commands keep running if the client disconnects.
+    '''
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def send(self, **message):
+        line = (json.dumps(message) + '\n').encode()
+        with self._lock:
+            if self.closed:
+                return
+            try:
+                self._wfile.write(line)
+                self._wfile.flush()
+            except OSError:
+                self.closed = True
+
+
+class _Stream(io.TextIOBase):
+    '''
+    A text stream (replacing `sys.stdout` or `sys.stderr`) sending everything written to a client.
+    '''
+
+    def __init__(self, connection, kind):
+        self.connection = connection
+        self.kind = kind
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if text:
+            self.connection.send(**{self.kind: text})
+        return len(text)
+
+
+class _LogHandler(logging.Handler):
+
+    def __init__(self, connection):
+        logging.Handler.__init__(self)
+        self.connection = connection
+
+    def emit(self, record):
+        try:
+            self.connection.send(log=self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        connection = _Connection(self.wfile)
+        try:
+            request = json.loads(self.rfile.readline().decode())
+        except ValueError:
+            request = None
+        if not isinstance(request, dict) or not isinstance(request.get('argv'), list):
+            connection.send(err='Invalid request, expected a JSON object with a list of arguments (argv).\n')
+            connection.send(exit=2)
+            return
+        connection.send(exit=self.server.dalymi.execute(request['argv'], connection))
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Server:
+    '''
+    Serves commands of a pipeline's command line interface from a long-lived process. The pipeline module (and its
+    dependencies) is imported once and loaded or saved resources are kept in a `WarmCache` across runs, so that
+    short, frequent commands do not pay for start-up and re-loading inputs.
+
+    Clients (see `submit` and `python -m dalymi`) connect to a Unix socket and send the arguments of a command, e.g.
+    `['run', '-t', 'train']`. Commands run one after the other, in the working directory of the server. Their logs and
+    output are streamed back to the client.
+
+    !!! warning
+        The served pipeline does not pick up changes of its code. Restart the server after changing the pipeline.
+
+    # Arguments
+    cli (dalymi.pipeline.PipelineCLI): the command line interface of the served pipeline
+    path (str): the location of the Unix socket
+    cache_size (int or str): the memory budget of the warm cache in bytes (e.g. `'4G'`)
+    external_context (dict): context passed on to each command, see `PipelineCLI.run`
+    '''
+
+    def __init__(self, cli, path=DEFAULT_SOCKET, cache_size='1G', external_context={}):
+        self.cli = cli
+        self.path = path
+        self.cache_size = cache_size
+        self.external_context = external_context
+        self._lock = threading.Lock()  # commands share the pipeline and hence run one after the other
+        self._server = None
+
+    def log(self, message):
+        logger = logging.getLogger(__name__)
+        logger.info(message)
+
+    def serve(self):
+        '''
+        Listens for commands until interrupted, terminated (`SIGTERM`) or `shutdown` is called.
+        '''
+        self._claim_socket()
+        pipeline = self.cli.pipeline
+        pipeline._warm = WarmCache(parse_size(self.cache_size))
+        self._server = socketserver.ThreadingUnixStreamServer(self.path, _RequestHandler)
+        self._server.daemon_threads = True
+        self._server.dalymi = self
+        terminate = None
+        if threading.current_thread() is threading.main_thread():
+            terminate = signal.signal(signal.SIGTERM, _interrupt)
+        self.log('Serving pipeline on {}.'.format(self.path))
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if terminate is not None:
+                signal.signal(signal.SIGTERM, terminate)
+            self._server.server_close()
+            os.remove(self.path)
+            pipeline._warm = None
+            self.log('Stopped serving pipeline on {}.'.format(self.path))
+
+    def shutdown(self):
+        '''
+        Stops `serve` (called from another thread).
+        '''
+        self._server.shutdown()
+
+    def _claim_socket(self):
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(self.path)  # left behind by a server that did not exit cleanly
+            return
+        finally:
+            probe.close()
+        raise RuntimeError('A pipeline is already served on {}.'.format(self.path))
+
+    def execute(self, argv, connection):
+        '''
+        Runs the command given by the arguments `argv`, streams its logs and output to `connection` and returns its
+        exit code.
+        '''
+        if argv[:1] == ['serve']:
+            connection.send(err='The serve command can not be submitted to a server.\n')
+            return 2
+        with self._lock:
+            handler = _LogHandler(connection)
+            root = logging.getLogger()
+            if root.handlers and root.handlers[0].formatter is not None:
+                handler.setFormatter(root.handlers[0].formatter)
+            else:
+                handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+            root.addHandler(handler)
+            try:
+                with redirect_stdout(_Stream(connection, 'out')), redirect_stderr(_Stream(connection, 'err')):
+                    try:
+                        self.cli.run(self.external_context, argv)
+                    except SystemExit as e:  # e.g. invalid arguments or help
+                        return e.code if isinstance(e.code, int) else int(e.code is not None)
+                    except Exception:
+                        traceback.print_exc()
+                        return 1
+                return 0
+            finally:
+                root.removeHandler(handler)
+
+
+def submit(argv, path=DEFAULT_SOCKET, stdout=None, stderr=None):
+    '''
+    Runs a command (e.g. `['run', '-t', 'train']`) on the pipeline served at `path`, writes its logs and error
+    output to `stderr` and its output to `stdout` (by default those of this process) and returns its exit code.
+    '''
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        client.sendall((json.dumps({'argv': list(argv)}) + '\n').encode())
+        for line in client.makefile('rb'):
+            message = json.loads(line.decode())
+            if 'exit' in message:
+                return message['exit']
+            if 'log' in message:
+                stderr.write(message['log'] + '\n')
+            elif 'out' in message:
+                stdout.write(message['out'])
+                stdout.flush()
+            elif 'err' in message:
+                stderr.write(message['err'])
+            stderr.flush()
+    finally:
+        client.close()
+    raise ConnectionError('The server at {} closed the connection before the command finished.'.format(path))
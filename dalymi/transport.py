@@ -0,0 +1,113 @@
+import hashlib
+import pickle
+import struct
+
+
+# Shared memory (`multiprocessing.shared_memory`) and out-of-band pickle buffers require Python >= 3.8:
+AVAILABLE = pickle.HIGHEST_PROTOCOL >= 5
+
+ALIGNMENT = 64  # byte alignment of buffers within segments
+_HEADER = struct.Struct('<Q')  # length of the pickled header at the start of a segment
+
+
+def _segment(name, create=False, size=0):
+    from multiprocessing import resource_tracker, shared_memory
+    segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+    # Segments are unlinked explicitly by the process running the scheduler. Unregister them from the resource tracker,
+    # which would otherwise unlink them as soon as the creating worker exits:
+    resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+class SharedMemoryTransport:
+    '''
+    Hands over task results between worker processes in shared memory segments. Data is pickled with protocol 5, so
+    that large buffers (of `numpy` arrays, `pandas` data frames or Arrow tables) are copied into the segment once
+    and consumers attach to them without copying or deserializing. Data without such buffers is not handed over.
+
+    Segments are named after the run and the handed over resource. They are created by producers and have to be
+    unlinked (see `unlink`) once no consumer needs them anymore. Requires Python >= 3.8.
+
+    # Arguments
+    run (str): a unique identifier of the run
+    '''
+
+    def __init__(self, run):
+        self.run = run
+        self._attached = {}  # keys: segment names, values: `SharedMemory` objects of segments in use by this process
+
+    def name(self, key):
+        digest = hashlib.sha1('{}:{}'.format(self.run, key).encode()).hexdigest()
+        return 'dalymi-{}'.format(digest[:16])  # short enough for all platforms
+
+    def put(self, key, data):
+        '''
+        Copies `data` into a new segment for `key`. Returns whether `data` was handed over.
+        '''
+        buffers = []
+        payload = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+        if not buffers:
+            return False
+        raws = [_.raw() for _ in buffers]
+        offsets = []
+        end = 0
+        for raw in raws:
+            start = end + (-end % ALIGNMENT)
+            offsets.append((start, raw.nbytes))
+            end = start + raw.nbytes
+        header = pickle.dumps((payload, offsets), protocol=5)
+        start = _HEADER.size + len(header)
+        start += -start % ALIGNMENT
+        try:
+            segment = _segment(self.name(key), create=True, size=max(1, start + end))
+        except FileExistsError:  # handed over already
+            return False
+        try:
+            _HEADER.pack_into(segment.buf, 0, len(header))
+            segment.buf[_HEADER.size:_HEADER.size + len(header)] = header
+            for raw, (offset, length) in zip(raws, offsets):
+                segment.buf[start + offset:start + offset + length] = raw.cast('B')
+        finally:
+            segment.close()
+        return True
+
+    def get(self, key):
+        '''
+        Returns the data handed over for `key`, whose buffers point into the shared segment. Raises `KeyError` if
+        there is no segment for `key`.
+        '''
+        name = self.name(key)
+        try:
+            segment = self._attached.get(name) or _segment(name)
+        except FileNotFoundError:
+            raise KeyError(key)
+        self._attached[name] = segment
+        length, = _HEADER.unpack_from(segment.buf, 0)
+        payload, offsets = pickle.loads(segment.buf[_HEADER.size:_HEADER.size + length])
+        start = _HEADER.size + length
+        start += -start % ALIGNMENT
+        return pickle.loads(payload, buffers=[segment.buf[start + offset:start + offset + size]
+                                              for offset, size in offsets])
+
+    def release(self):
+        '''
+        Detaches this process from all segments which are not referenced by any data anymore.
+        '''
+        for name, segment in list(self._attached.items()):
+            try:
+                segment.close()
+            except BufferError:  # still referenced
+                continue
+            del self._attached[name]
+
+    def unlink(self, key):
+        '''
+        Frees the segment for `key` (once all processes detached from it).
+        '''
+        from multiprocessing import shared_memory
+        try:
+            segment = shared_memory.SharedMemory(name=self.name(key))  # registered, and unregistered by `unlink`
+        except FileNotFoundError:
+            return
+        segment.close()
+        segment.unlink()
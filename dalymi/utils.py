@@ -0,0 +1,60 @@
+import datetime
+import functools
+import re
+import string
+
+
+SIZE_UNITS = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+
+
+def parse_size(size):
+    '''
+    Converts a human-readable size like `'512M'` or `'2G'` (or a plain number of bytes) to a number of bytes.
+    '''
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$', size, re.IGNORECASE)
+    if match is None:
+        raise ValueError('Could not parse size \'{}\'. Expected e.g. \'2048\', \'512M\' or \'2G\'.'.format(size))
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit.upper()])
+
+
+@functools.lru_cache(maxsize=None)
+def placeholders(template):
+    '''
+    Returns the (frozen) set of context keys used by a location template, e.g. `{'date'}` for
+    `'data/{date:%Y}/raw.csv'`. Memoized, since locations are parsed again and again.
+    '''
+    fields = [_[1] for _ in string.Formatter().parse(template) if _[1]]
+    return frozenset(re.split(r'[.\[]', _)[0] for _ in fields)
+
+
+def parse_grid(specs, types=None):
+    '''
+    Converts command line sweep specifications like `['clusters=2..20', 'metric=l1,l2']` to a dictionary of value
+    lists. `a..b` denotes an inclusive range of integers or ISO dates (e.g. `2020-01-01..2020-01-31`, in days),
+    otherwise values are separated by commas. `types` maps keys to functions converting single (string) values, e.g.
+    the `type` of the respective command line argument.
+    '''
+    types = types or {}
+    grid = {}
+    for spec in specs:
+        name, separator, values = spec.partition('=')
+        name = name.strip().replace('-', '_')
+        if not separator or not name or not values:
+            raise ValueError('Could not parse sweep \'{}\'. Expected e.g. \'clusters=2..20\' or \'k=1,2,4\'.'
+                             .format(spec))
+        convert = types.get(name)
+        match = re.match(r'^\s*(-?\d+)\s*\.\.\s*(-?\d+)\s*$', values)
+        dates = re.match(r'^\s*(\d{4}-\d{2}-\d{2})\s*\.\.\s*(\d{4}-\d{2}-\d{2})\s*$', values)
+        if match:
+            values = range(int(match.group(1)), int(match.group(2)) + 1)
+            grid[name] = [convert(str(_)) for _ in values] if convert else list(values)
+        elif dates:
+            start, end = [datetime.datetime.strptime(_, '%Y-%m-%d').date() for _ in dates.groups()]
+            values = [start + datetime.timedelta(days=_) for _ in range((end - start).days + 1)]
+            grid[name] = [convert(str(_)) for _ in values] if convert else values
+        else:
+            grid[name] = [convert(_) if convert else _ for _ in values.split(',')]
+    return grid
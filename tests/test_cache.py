@@ -0,0 +1,21 @@
+from dalymi.cache import ObjectCache
+
+
+def test_ObjectCache():
+    cache = ObjectCache(budget=400)
+    cache.put('a', b'x' * 100, pending=2)
+    cache.put('b', b'x' * 100, pending=1)
+    assert cache.take('a') == b'x' * 100
+    assert 'a' in cache
+    cache.take('a')
+    assert 'a' not in cache
+    cache.put('c', b'x' * 150, pending=1)
+    cache.put('d', b'x' * 150, pending=1)  # evicts least recently used 'b'
+    assert 'b' not in cache and 'c' in cache and 'd' in cache
+    cache.put('e', b'x' * 1000, pending=1)  # larger than the budget
+    assert 'e' not in cache
+    data = [1, 2]
+    cache.put('f', data, pending=2)
+    copied = cache.take('f')
+    assert copied == data and copied is not data
+    assert cache.take('f') is data  # the last consumer
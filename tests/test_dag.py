@@ -0,0 +1,26 @@
+import pytest
+
+from dalymi.dag import DAG, CycleError
+
+
+def test_DAG_queries():
+    dag = DAG()
+    dag.add_outputs('top', ['a'])
+    dag.add_inputs('left', ['a'])
+    dag.add_outputs('left', ['b'])
+    dag.add_inputs('right', ['a'])
+    dag.add_outputs('right', ['c'])
+    dag.add_inputs('bottom', ['b', 'c'])
+    assert dag.upstream('bottom') == {'top', 'left', 'right'}
+    assert dag.downstream('top') == {'left', 'right', 'bottom'}
+    assert dag.topological_sort() == ['top', 'left', 'right', 'bottom']
+    assert dag.topological_sort(['bottom', 'right']) == ['right', 'bottom']
+
+
+def test_DAG_detects_cycles_on_registration():
+    dag = DAG()
+    dag.add_inputs('first', ['b'])
+    dag.add_outputs('first', ['a'])
+    dag.add_inputs('second', ['a'])
+    with pytest.raises(CycleError):
+        dag.add_outputs('second', ['b'])
@@ -0,0 +1,20 @@
+import json
+import os
+import time
+
+from dalymi.locking import TaskLock
+
+
+def test_TaskLock(tmpdir):
+    path = os.path.join(str(tmpdir), '.task.lock')
+    lock = TaskLock(path, timeout=60)
+    assert lock.acquire()
+    assert not TaskLock(path).acquire()
+    lock.release()
+    assert not os.path.exists(path)
+    with open(path, 'w') as f:
+        json.dump({'host': 'elsewhere', 'pid': 1}, f)
+    os.utime(path, (time.time() - 120, time.time() - 120))  # heartbeat stopped two minutes ago
+    other = TaskLock(path, timeout=60)
+    assert other.acquire()
+    other.release()
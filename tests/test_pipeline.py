@@ -1,5 +1,627 @@
-from dalymi import Pipeline
+import asyncio
+import collections
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from dalymi import aio, Pipeline, PipelineCLI
+from dalymi.catalog import Catalog
+from dalymi.resources import Appended, Delta, PandasCSV, Partitioned, Pickle
 
 
 def test_Pipeline():
-    pipeline = Pipeline()
\ No newline at end of file
+    pipeline = Pipeline()
+
+
+def diamond(tmpdir):
+    ''' A pipeline `top -> (left, right) -> bottom` that counts task executions. '''
+    pl = Pipeline()
+    calls = collections.Counter()
+    top = Pickle(name='top', loc=os.path.join(str(tmpdir), 'top.pkl'))
+    left = Pickle(name='left', loc=os.path.join(str(tmpdir), 'left.pkl'))
+    right = Pickle(name='right', loc=os.path.join(str(tmpdir), 'right.pkl'))
+    bottom = Pickle(name='bottom', loc=os.path.join(str(tmpdir), 'bottom.pkl'))
+
+    @pl.output(top)
+    def make_top(**context):
+        calls['make_top'] += 1
+        return 1
+
+    @pl.output(left)
+    @pl.input(top)
+    def make_left(top, **context):
+        calls['make_left'] += 1
+        return top + 1
+
+    @pl.output(right)
+    @pl.input(top)
+    def make_right(top, **context):
+        calls['make_right'] += 1
+        return top + 2
+
+    @pl.output(bottom)
+    @pl.input(left, right)
+    def make_bottom(left, right, **context):
+        calls['make_bottom'] += 1
+        return left + right
+
+    return pl, calls, bottom
+
+
+def test_run_parallel(tmpdir):
+    pl, calls, bottom = diamond(tmpdir)
+    pl.run(workers=4)
+    assert bottom._load({}) == 5
+    assert set(calls.values()) == {1}
+
+
+def test_run_task_runs_missing_producers_once(tmpdir):
+    pl, calls, bottom = diamond(tmpdir)
+    pl.run(task='make_bottom', workers=2)
+    assert calls == {'make_top': 1, 'make_left': 1, 'make_right': 1, 'make_bottom': 1}
+
+
+def test_run_with_cache_skips_loads(tmpdir, monkeypatch):
+    pl, calls, bottom = diamond(tmpdir)
+    loads = collections.Counter()
+    original_load = Pickle.load
+
+    def counting_load(self, path):
+        loads[self.name] += 1
+        return original_load(self, path)
+
+    monkeypatch.setattr(Pickle, 'load', counting_load)
+    pl.run(workers=2, cache_size='1M')
+    assert loads == {}
+    assert pl._cache is None
+    assert bottom._load({}) == 5
+
+
+def test_run_with_cache_hands_out_copies(tmpdir):
+    pl = Pipeline()
+    prepared = Pickle(name='prepared', loc=os.path.join(str(tmpdir), 'prepared.pkl'))
+    predictions = Pickle(name='predictions', loc=os.path.join(str(tmpdir), 'predictions_{clusters}.pkl'))
+
+    @pl.output(prepared)
+    def prepare(**context):
+        return ['a', 'b']
+
+    @pl.output(predictions)
+    @pl.input(prepared)
+    def predict(prepared, clusters, **context):
+        prepared.append(clusters)  # in place, like `predict_clusters` of the iris example
+        return prepared
+
+    pl.run(grid={'clusters': [2, 3]}, cache_size='1M')
+    assert [predictions._load({'clusters': _}) for _ in [2, 3]] == [['a', 'b', 2], ['a', 'b', 3]]
+
+
+def test_run_write_behind(tmpdir, monkeypatch):
+    pl, calls, bottom = diamond(tmpdir)
+    loads = collections.Counter()
+    original_load, original_save = Pickle.load, Pickle.save
+
+    def counting_load(self, path):
+        loads[self.name] += 1
+        return original_load(self, path)
+
+    def slow_save(self, path, data):
+        time.sleep(0.2)
+        original_save(self, path, data)
+
+    monkeypatch.setattr(Pickle, 'load', counting_load)
+    monkeypatch.setattr(Pickle, 'save', slow_save)
+    pl.run(workers=2, write_behind=2)
+    assert pl._writer is None and not pl._writes
+    assert bottom._load({}) == 5
+    assert loads == {'bottom': 1}
+    pl.run()
+    assert set(calls.values()) == {1}
+
+
+def test_run_write_behind_saves_private_objects(tmpdir, monkeypatch):
+    pl = Pipeline()
+    numbers = Pickle(name='numbers', loc=os.path.join(str(tmpdir), 'numbers.pkl'))
+    squares = Pickle(name='squares', loc=os.path.join(str(tmpdir), 'squares.pkl'))
+    original_save = Pickle.save
+
+    def slow_save(self, path, data):
+        time.sleep(0.2)
+        original_save(self, path, data)
+
+    @pl.output(numbers)
+    def make_numbers(**context):
+        return {'number': [1, 2]}
+
+    @pl.output(squares)
+    @pl.input(numbers)
+    def make_squares(numbers, **context):
+        numbers['square'] = [_ ** 2 for _ in numbers['number']]  # in place, while numbers is being saved
+        return numbers
+
+    monkeypatch.setattr(Pickle, 'save', slow_save)
+    pl.run(write_behind=1, cache_size='1M')
+    assert numbers._load({}) == {'number': [1, 2]}
+    assert squares._load({}) == {'number': [1, 2], 'square': [1, 4]}
+
+
+def test_run_with_catalog(tmpdir, monkeypatch, capsys):
+    pl, calls, bottom = diamond(tmpdir)
+    catalog = os.path.join(str(tmpdir), 'catalog.db')
+    pl.run(catalog=catalog)
+    checks = collections.Counter()
+    original_check = Pickle.check
+
+    def counting_check(self, path):
+        checks[self.name] += 1
+        return original_check(self, path)
+
+    monkeypatch.setattr(Pickle, 'check', counting_check)
+    os.remove(os.path.join(str(tmpdir), 'left.pkl'))
+    pl.run(catalog=catalog, fingerprint='off')
+    assert not checks and set(calls.values()) == {1}
+    pl.run(catalog=catalog, fingerprint='off', verify=True)
+    assert calls['make_left'] == 2 and calls['make_bottom'] == 1
+    entries = pl.status(catalog=catalog)
+    assert [_['resource'] for _ in entries] == ['top', 'left', 'right', 'bottom']
+    assert all(_['built'] and _['size'] > 0 for _ in entries)
+    assert entries[1]['task'] == 'make_left' and entries[1]['duration'] >= 0
+    assert 'built' in capsys.readouterr().out
+    pl.undo(task='make_bottom', catalog=catalog)
+    assert not pl.status(catalog=catalog)[-1]['built']
+
+
+def test_run_with_catalog_takes_stamps_and_fingerprints_from_it(tmpdir, monkeypatch):
+    pl, calls, bottom = diamond(tmpdir)
+    catalog = os.path.join(str(tmpdir), 'catalog.db')
+    pl.run(catalog=catalog)
+    accesses = collections.Counter()
+
+    def counting(method):
+        original = getattr(Pickle, method)
+
+        def counted(self, *args, **kwargs):
+            accesses[method] += 1
+            return original(self, *args, **kwargs)
+        return counted
+
+    for method in ['read_meta', 'stamp']:
+        monkeypatch.setattr(Pickle, method, counting(method))
+    pl.run(catalog=catalog)
+    assert not accesses and set(calls.values()) == {1}
+    Pickle(name='top', loc=os.path.join(str(tmpdir), 'top.pkl'))._save(2, {})
+    pl.run(catalog=catalog, verify=True)
+    assert accesses['read_meta'] and accesses['stamp']
+    assert calls == {'make_top': 1, 'make_left': 2, 'make_right': 2, 'make_bottom': 2}
+    assert bottom._load({}) == 7
+
+
+def test_run_with_catalog_checks_external_inputs(tmpdir):
+    pl = Pipeline()
+    source = Pickle(name='source', loc=os.path.join(str(tmpdir), 'source.pkl'))
+    result = Pickle(name='result', loc=os.path.join(str(tmpdir), 'result.pkl'))
+    catalog = os.path.join(str(tmpdir), 'catalog.db')
+
+    @pl.output(result)
+    @pl.input(source)
+    def multiply(source, **context):
+        return source * 10
+
+    source._save(1, {})
+    pl.run(catalog=catalog)
+    assert result._load({}) == 10
+    source._save(2, {})  # new source data, not produced by the pipeline
+    pl.run(catalog=catalog)
+    assert result._load({}) == 20
+    assert Catalog(catalog).get(source.loc) is None
+
+
+def test_run_appends_deltas(tmpdir):
+    pd = pytest.importorskip('pandas')
+    pl = Pipeline()
+    raw = PandasCSV(name='raw', loc=os.path.join(str(tmpdir), 'raw.csv'))
+    doubled = PandasCSV(name='doubled', loc=os.path.join(str(tmpdir), 'doubled.csv'))
+    events = Pickle(name='events', loc=os.path.join(str(tmpdir), 'events', '{day}.pkl'))
+    counts = Pickle(name='counts', loc=os.path.join(str(tmpdir), 'counts.pkl'))
+    received = []
+
+    @pl.output(raw)
+    def make_raw(**context):
+        return pd.DataFrame({'x': [1, 2]})
+
+    @pl.output(Appended(doubled))
+    @pl.input(Delta(raw))
+    def double(raw, **context):
+        received.append(list(raw.x))
+        return raw * 2
+
+    @pl.output(events)
+    def make_events(day, **context):
+        return [day] * day
+
+    @pl.output(Appended(counts))
+    @pl.input(Delta(Partitioned(events, 'day')))
+    def count(events, **context):
+        received.append(events)
+        return [len(_) for _ in events]
+
+    pl.run(task='double')
+    pd.DataFrame({'x': [3]}).to_csv(raw.loc, mode='a', header=False, index=False)  # new data lands
+    os.utime(raw.loc, (time.time() + 1, time.time() + 1))
+    pl.run(task='double')
+    assert received == [[1, 2], [3]]
+    assert list(doubled._load({}).x) == [2, 4, 6]
+    pl.run(task='double')  # up to date
+    assert len(received) == 2
+    pd.DataFrame({'x': [9]}).to_csv(doubled.loc, mode='a', header=False, index=False)  # invalidates the watermark
+    pd.DataFrame({'x': [4]}).to_csv(raw.loc, mode='a', header=False, index=False)
+    os.utime(raw.loc, (time.time() + 2, time.time() + 2))
+    pl.run(task='double')
+    assert received[-1] == [1, 2, 3, 4] and list(doubled._load({}).x) == [2, 4, 6, 8]
+    pd.DataFrame({'x': [10, 20, 30, 40, 50]}).to_csv(raw.loc, index=False)  # rewrites processed rows
+    os.utime(raw.loc, (time.time() + 3, time.time() + 3))
+    pl.run(task='double')
+    assert received[-1] == [10, 20, 30, 40, 50] and list(doubled._load({}).x) == [20, 40, 60, 80, 100]
+
+    del received[:]
+    for day in [1, 2]:
+        pl.run(task='make_events', day=day)
+    pl.run(task='count')
+    pl.run(task='make_events', day=3)
+    os.utime(events.loc.format(day=3), (time.time() + 3, time.time() + 3))
+    pl.run(task='count')
+    assert received == [[[1], [2, 2]], [[3, 3, 3]]]
+    assert counts._load({}) == [1, 2, 3]
+
+
+def test_gc_evicts_intermediates_without_cascading_rebuilds(tmpdir, capsys):
+    pl, calls, bottom = diamond(tmpdir)
+    path = os.path.join(str(tmpdir), '{}.pkl').format
+    catalog = os.path.join(str(tmpdir), 'catalog.db')
+    pl.run(catalog=catalog)
+    for name in ['top', 'right']:  # leaves left least recently used
+        Catalog(catalog).touch(path(name))
+    sizes = [os.path.getsize(path(_)) for _ in ['top', 'left', 'right', 'bottom']]
+    assert pl.gc(budget=sum(sizes) - 1, workers=2, catalog=catalog) == [path('left')]
+    capsys.readouterr()
+    assert pl.gc(budget=0, dry_run=True, catalog=catalog) == [path('top'), path('right')]
+    printed = capsys.readouterr().out
+    assert '<top> at \'{}\': {} bytes'.format(path('top'), sizes[0]) in printed
+    assert 'Total: {} bytes freed'.format(sizes[0] + sizes[2]) in printed
+    assert os.path.exists(path('top'))
+    assert pl.plan() == []
+    pl.run()
+    assert set(calls.values()) == {1}
+    os.remove(path('bottom'))
+    pl.run()  # rebuilds left on demand, but identical data does not invalidate other consumers
+    assert calls == {'make_top': 1, 'make_left': 2, 'make_right': 1, 'make_bottom': 2}
+    pl.run()
+    assert calls['make_bottom'] == 2
+    assert bottom._load({}) == 5
+
+
+def test_run_produces_evicted_inputs_once_for_parallel_consumers(tmpdir, monkeypatch):
+    pl, calls, bottom = diamond(tmpdir)
+    path = os.path.join(str(tmpdir), '{}.pkl').format
+    catalog = os.path.join(str(tmpdir), 'catalog.db')
+    pl.run(catalog=catalog)
+    for name in ['left', 'right', 'bottom']:  # leaves top least recently used
+        Catalog(catalog).touch(path(name))
+    assert pl.gc(budget=sum(os.path.getsize(path(_)) for _ in ['left', 'right', 'bottom']), catalog=catalog) == \
+        [path('top')]
+    for name in ['left', 'right']:
+        os.remove(path(name))
+        Catalog(catalog).forget(path(name))
+    save = Pickle.save
+
+    def slow_save(self, path, data):
+        time.sleep(0.2)  # both consumers demand top while it is being produced
+        return save(self, path, data)
+
+    monkeypatch.setattr(Pickle, 'save', slow_save)
+    pl.run(workers=2, catalog=catalog)
+    assert calls == {'make_top': 2, 'make_left': 2, 'make_right': 2, 'make_bottom': 2}
+    assert bottom._load({}) == 5
+
+
+def test_gc_keeps_locations_of_other_resources(tmpdir, capsys):
+    pl = Pipeline()
+    data = os.path.join(str(tmpdir), 'data')
+    part = Pickle(name='part', loc=os.path.join(data, '{k}.pkl'))
+    final = Pickle(name='final', loc=os.path.join(data, 'final.pkl'))
+
+    @pl.output(part)
+    def make_part(k, **context):
+        return k
+
+    @pl.output(final, pinned=True)
+    @pl.input(part)
+    def make_final(part, **context):
+        return part
+
+    pl.run(k='a')
+    assert pl.gc(budget=0, dry_run=True) == [os.path.join(data, 'a.pkl')]
+    assert 'final.pkl' not in capsys.readouterr().out
+
+
+def test_run_reruns_stale_tasks(tmpdir):
+    pl, calls, bottom = diamond(tmpdir)
+    pl.run()
+    pl.run()
+    assert set(calls.values()) == {1}
+    os.utime(os.path.join(str(tmpdir), 'top.pkl'), (1, 1))
+    pl.run()
+    assert calls == {'make_top': 1, 'make_left': 2, 'make_right': 2, 'make_bottom': 2}
+
+
+def test_run_content_fingerprints_ignore_touched_inputs(tmpdir):
+    pl, calls, bottom = diamond(tmpdir)
+    pl.run(fingerprint='content')
+    os.utime(os.path.join(str(tmpdir), 'top.pkl'), (1, 1))
+    pl.run(fingerprint='content')
+    assert set(calls.values()) == {1}
+    Pickle(name='top', loc=os.path.join(str(tmpdir), 'top.pkl'))._save(2, {})
+    pl.run(fingerprint='content')
+    assert bottom._load({}) == 7
+
+
+def test_run_fingerprint_off_only_checks_existence(tmpdir):
+    pl, calls, bottom = diamond(tmpdir)
+    pl.run(fingerprint='off')
+    os.utime(os.path.join(str(tmpdir), 'top.pkl'), (1, 1))
+    pl.run(fingerprint='off')
+    assert set(calls.values()) == {1}
+
+
+def test_plan_does_not_execute(tmpdir):
+    pl, calls, bottom = diamond(tmpdir)
+    assert pl.plan() == ['make_top', 'make_left', 'make_right', 'make_bottom']
+    assert not calls
+    pl.run(task='make_left')
+    assert pl.plan() == ['make_right', 'make_bottom']
+    os.utime(os.path.join(str(tmpdir), 'top.pkl'), (1, 1))
+    assert pl.plan(task='make_left') == ['make_left']
+
+
+def test_run_with_profile(tmpdir):
+    pl, calls, bottom = diamond(tmpdir)
+    path = os.path.join(str(tmpdir), 'profile.json')
+    pl.run(workers=2, profile=path)
+    with open(path) as f:
+        profile = json.load(f)
+    assert set(profile['tasks']) == {'make_top', 'make_left', 'make_right', 'make_bottom'}
+    assert profile['tasks']['make_bottom']['bytes_read'] > 0
+    assert profile['resources']['top'] == dict(profile['resources']['top'], loads=2, saves=1)
+    assert {_['cat'] for _ in profile['traceEvents']} == {'task', 'load', 'save'}
+
+
+def test_run_streams_chunked_resources(tmpdir):
+    pl = Pipeline()
+    numbers = Pickle(name='numbers', loc=os.path.join(str(tmpdir), 'numbers.pkl'), chunked=True)
+    doubled = Pickle(name='doubled', loc=os.path.join(str(tmpdir), 'doubled.pkl'), chunked=True)
+
+    @pl.output(numbers)
+    def make_numbers(**context):
+        for i in range(5):
+            yield [i] * 3
+
+    @pl.output(doubled)
+    @pl.input(numbers)
+    def double(numbers, **context):
+        for chunk in numbers:
+            yield [2 * _ for _ in chunk]
+
+    pl.run(cache_size='1M')
+    chunks = doubled._load({})
+    assert next(chunks) == [0, 0, 0]
+    assert list(chunks) == [[2 * i] * 3 for i in range(1, 5)]
+
+
+def test_run_grid_shares_upstream_work(tmpdir):
+    pl = Pipeline()
+    calls = collections.Counter()
+    data = Pickle(name='data', loc=os.path.join(str(tmpdir), 'data.pkl'))
+    model = Pickle(name='model', loc=os.path.join(str(tmpdir), 'k={k}', 'model.pkl'))
+    score = Pickle(name='score', loc=os.path.join(str(tmpdir), 'k={k}', 'score.pkl'))
+
+    @pl.output(data)
+    def make_data(**context):
+        calls['make_data'] += 1
+        return 10
+
+    @pl.output(model)
+    @pl.input(data)
+    def train(data, k, **context):
+        calls['train'] += 1
+        return data * k
+
+    @pl.output(score)
+    @pl.input(model)
+    def evaluate(model, **context):
+        calls['evaluate'] += 1
+        return -model
+
+    assert len(pl.plan(grid={'k': [1, 2, 3]})) == 7
+    pl.run(workers=3, grid={'k': [1, 2, 3]})
+    assert calls == {'make_data': 1, 'train': 3, 'evaluate': 3}
+    assert [score._load({'k': _}) for _ in [1, 2, 3]] == [-10, -20, -30]
+
+
+def test_undo_and_status_expand_grids(tmpdir, capsys):
+    pl = Pipeline()
+    score = Pickle(name='score', loc=os.path.join(str(tmpdir), 'k={k}', 'score.pkl'))
+    catalog = os.path.join(str(tmpdir), 'catalog.db')
+
+    @pl.output(score)
+    def evaluate(k, **context):
+        return -k
+
+    pl.run(grid={'k': [1, 2, 3]}, catalog=catalog)
+    PipelineCLI(pl).run(argv=['undo', '-t', 'evaluate', '--grid', 'k=1,2', '--catalog', catalog])
+    assert [os.path.exists(score.path({'k': _})) for _ in [1, 2, 3]] == [False, False, True]
+    entries = pl.status(task='evaluate', catalog=catalog, grid={'k': [1, 2, 3]})
+    assert [(_['path'], _['built']) for _ in entries] == [(score.path({'k': _}), _ == 3) for _ in [1, 2, 3]]
+
+
+def test_backfill_and_partitioned_input(tmpdir):
+    pl = Pipeline()
+    calls = collections.Counter()
+    events = Pickle(name='events', loc=os.path.join(str(tmpdir), 'day={day}', 'events.pkl'))
+    total = Pickle(name='total', loc=os.path.join(str(tmpdir), 'total.pkl'))
+
+    @pl.output(events)
+    def extract(day, **context):
+        calls[day] += 1
+        return day
+
+    @pl.output(total)
+    @pl.input(Partitioned(events, 'day', values=lambda context: range(1, 6), combine=sum))
+    def aggregate(events, **context):
+        return events
+
+    pl.backfill({'day': [1, 2, 3]}, task='extract', workers=2)
+    pl.backfill({'day': [1, 2, 3, 4]}, task='extract', workers=2)
+    assert calls == {1: 1, 2: 1, 3: 1, 4: 1}
+    pl.run(task='aggregate')
+    assert calls == {1: 1, 2: 1, 3: 1, 4: 1, 5: 1}
+    assert total._load({}) == 15
+
+
+def test_run_schedules_missing_partitions_once(tmpdir):
+    pl = Pipeline()
+    calls = collections.Counter()
+    events = Pickle(name='events', loc=os.path.join(str(tmpdir), 'day={day}', 'events.pkl'))
+    total = Pickle(name='total', loc=os.path.join(str(tmpdir), 'total.pkl'))
+    peak = Pickle(name='peak', loc=os.path.join(str(tmpdir), 'peak.pkl'))
+    days = Partitioned(events, 'day', values=lambda context: range(1, 5), combine=list)
+
+    @pl.output(events)
+    def extract(day, **context):
+        calls[day] += 1
+        time.sleep(0.05)
+        return day
+
+    @pl.output(total)
+    @pl.input(days)
+    def aggregate(events, **context):
+        return sum(events)
+
+    @pl.output(peak)
+    @pl.input(days)
+    def maximum(events, **context):
+        return max(events)
+
+    assert pl.plan() == ['extract[day=1]', 'extract[day=2]', 'extract[day=3]', 'extract[day=4]', 'aggregate',
+                         'maximum']
+    pl.run(workers=4)
+    assert calls == {1: 1, 2: 1, 3: 1, 4: 1}
+    assert (total._load({}), peak._load({})) == (10, 4)
+
+
+def test_distributed_runs_share_work(tmpdir):
+    pipelines = [diamond(tmpdir) for _ in range(3)]  # three independent runs on the same files
+    threads = [threading.Thread(target=pl.run, kwargs={'workers': 2, 'distributed': True})
+               for pl, _, _ in pipelines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = sum((calls for _, calls, _ in pipelines), collections.Counter())
+    assert set(total.values()) == {1}
+    assert not [_ for _ in os.listdir(str(tmpdir)) if _.endswith('.lock')]
+
+
+class SlowPickle(Pickle):
+    ''' A `Pickle` on simulated high-latency storage, which records when it was loaded. '''
+
+    def __init__(self, *args, **kwargs):
+        Pickle.__init__(self, *args, **kwargs)
+        self.loaded = []
+
+    async def aload(self, path):
+        await asyncio.sleep(0.2)
+        self.loaded.append(time.perf_counter())
+        return self.load(path)
+
+
+def test_run_loads_inputs_concurrently(tmpdir):
+    pl = Pipeline()
+    inputs = [SlowPickle(name=name, loc=os.path.join(str(tmpdir), name + '.pkl')) for name in 'abcd']
+    total = Pickle(name='total', loc=os.path.join(str(tmpdir), 'total.pkl'))
+    for i, resource in enumerate(inputs):
+        resource._save(i, {})
+
+    @pl.output(total)
+    @pl.input(*inputs)
+    def add(a, b, c, d, **context):
+        return a + b + c + d
+
+    start = time.perf_counter()
+    pl.run()
+    assert time.perf_counter() - start < 0.6
+    assert total._load({}) == 6
+
+
+def test_run_prefetches_inputs(tmpdir):
+    pl = Pipeline()
+    lookup = SlowPickle(name='lookup', loc=os.path.join(str(tmpdir), 'lookup.pkl'))
+    raw = Pickle(name='raw', loc=os.path.join(str(tmpdir), 'raw.pkl'))
+    joined = Pickle(name='joined', loc=os.path.join(str(tmpdir), 'joined.pkl'))
+    finished = []
+
+    @pl.output(lookup)
+    def make_lookup(**context):
+        return 1
+
+    @pl.output(raw)
+    def make_raw(**context):
+        time.sleep(0.3)
+        finished.append(time.perf_counter())
+        return 2
+
+    @pl.output(joined)
+    @pl.input(lookup, raw)
+    def join(lookup, raw, **context):
+        return lookup + raw
+
+    pl.run(task='make_lookup')
+    pl.run(prefetch=True)
+    assert lookup.loaded[0] < finished[0]
+    assert joined._load({}) == 3
+    assert pl._prefetches is None and pl._io is None
+
+
+class Unformattable:
+
+    def __format__(self, spec):
+        raise AssertionError('formatted a disabled log message')
+
+
+def test_run_inline_io_and_task_records(tmpdir):
+    pl, calls, bottom = diamond(tmpdir)
+    slow = SlowPickle(name='slow', loc=os.path.join(str(tmpdir), 'slow.pkl'))
+
+    @pl.output(slow)
+    @pl.input(bottom)
+    def make_slow(bottom, **context):
+        return bottom
+
+    @pl.input(slow)
+    def report(slow, **context):
+        calls['report'] += 1
+
+    record = pl.tasks['make_left']
+    assert record.inputs[0].name == 'top' and record.outputs[0].name == 'left'
+    assert pl.funcs['make_left'] is record.wrapped and pl.original_funcs[record.wrapped] is record.func
+    assert pl.outputs[record.func] == record.outputs and pl.producers[bottom] is pl.funcs['make_bottom']
+    assert pl.tasks['report'].outputs is None and 'report' in pl.inputs
+    assert pl.get_context_names('make_left') == set()
+    assert pl._inline([bottom]) and not pl._inline([slow]) and not pl._inline([bottom, slow])
+    pl.run()  # inputs with native asyncio implementations run on the I/O loop
+    assert calls['report'] == 1 and slow.loaded
+    with pytest.raises(RuntimeError):
+        aio.run_inline([slow.aload(slow.loc)])
+    pl.log('{}', Unformattable())  # INFO is disabled by default
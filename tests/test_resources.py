@@ -0,0 +1,183 @@
+import os
+
+import pytest
+
+from dalymi import assertions, resources
+
+
+@pytest.mark.parametrize('resource_class, filename', [
+    (resources.PandasCSV, 'df.csv'),
+    (resources.PandasParquet, 'df.parquet'),
+    (resources.PandasFeather, 'df.feather'),
+])
+def test_PandasDF_select(tmpdir, resource_class, filename):
+    pd = pytest.importorskip('pandas')
+    if resource_class is not resources.PandasCSV:
+        pytest.importorskip('pyarrow')
+    resource = resource_class(name='df', loc=os.path.join(str(tmpdir), filename), columns=['a', 'b', 'c'])
+    df = pd.DataFrame({'a': [1, 2], 'b': [3., 4.], 'c': ['x', 'y']})
+    resource._save(df, {})
+    pd.testing.assert_frame_equal(resource._load({}), df)
+    selected = resource.select(['c', 'a'])
+    assert list(selected._load({}).columns) == ['c', 'a']
+    assert list(selected.adapt(df).columns) == ['c', 'a']
+    with pytest.raises(AssertionError):
+        resource.select(['a'])._save(df, {})
+
+
+def test_PandasCSV_chunked(tmpdir):
+    pd = pytest.importorskip('pandas')
+    resource = resources.PandasCSV(name='df', loc=os.path.join(str(tmpdir), 'df.csv'), columns=['a', 'b'],
+                                   chunksize=2)
+    resource._save((pd.DataFrame({'a': [i, i + 1], 'b': [i, i]}) for i in range(0, 6, 2)), {})
+    chunks = list(resource._load({}))
+    assert [len(_) for _ in chunks] == [2, 2, 2]
+    assert list(pd.concat(chunks)['a']) == list(range(6))
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip', 'bz2', 'lzma', 'zstd', 'lz4'])
+def test_Pickle_compression(tmpdir, compression):
+    resource = resources.Pickle(name='obj', loc=os.path.join(str(tmpdir), 'obj.pkl'), compression=compression)
+    data = {'numbers': list(range(1000))}
+    resource._save(data, {})
+    assert resources.Pickle(name='obj', loc=resource.loc)._load({}) == data
+
+
+def test_Pickle_out_of_band(tmpdir):
+    np = pytest.importorskip('numpy')
+    if resources.pickle.HIGHEST_PROTOCOL < 5:
+        pytest.skip('requires pickle protocol 5')
+    resource = resources.Pickle(name='obj', loc=os.path.join(str(tmpdir), 'obj.pkl'), compression='gzip',
+                                out_of_band=True)
+    data = {'array': np.arange(10**5, dtype='float64'), 'label': 'x'}
+    resource._save(data, {})
+    assert os.path.getsize(resource.loc) < 1000
+    loaded = resource._load({})
+    np.testing.assert_array_equal(loaded['array'], data['array'])
+    loaded['array'][0] = -1  # copy-on-write mapping
+    assert resource._load({})['array'][0] == 0
+    for empty in [np.array([]), {'x': np.zeros(0), 'y': np.zeros((0, 3), dtype='int32')}]:
+        resource._save(empty, {})  # an empty buffers file can not be memory-mapped
+        loaded = resource._load({})
+        assert loaded.shape == (0,) if isinstance(empty, np.ndarray) else loaded['y'].shape == (0, 3)
+    resource._save({'x': np.zeros(0), 'y': np.ones(3)}, {})
+    assert list(resource._load({})['y']) == [1, 1, 1]
+    resource._delete({})
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_LocalFileMixin_atomic_save(tmpdir):
+    resource = resources.Pickle(name='numbers', loc=os.path.join(str(tmpdir), 'numbers.pkl'), chunked=True)
+
+    def failing():
+        yield [1]
+        raise RuntimeError('crash')
+
+    resource._save([[0]], {})
+    with pytest.raises(RuntimeError):
+        resource._save(failing(), {})
+    assert os.listdir(str(tmpdir)) == ['numbers.pkl']
+    assert list(resource._load({})) == [[0]]
+
+
+def test_PandasCSV_append_truncates_failed_writes(tmpdir, monkeypatch):
+    pd = pytest.importorskip('pandas')
+    resource = resources.PandasCSV(name='df', loc=os.path.join(str(tmpdir), 'df.csv'))
+    resource._save(pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']}), {})
+
+    def crash(df, path, **kwargs):
+        with open(path, 'a') as f:
+            f.write('3,')  # a partially written row
+        raise RuntimeError('crash')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(pd.DataFrame, 'to_csv', crash)
+        with pytest.raises(RuntimeError):
+            resource.append(resource.loc, pd.DataFrame({'b': ['z'], 'a': [3]}))
+    assert resource._load({}).values.tolist() == [[1, 'x'], [2, 'y']]
+    inode = os.stat(resource.loc).st_ino
+    resource.append(resource.loc, pd.DataFrame({'b': ['z'], 'a': [3]}))
+    assert resource._load({}).values.tolist() == [[1, 'x'], [2, 'y'], [3, 'z']]
+    assert os.stat(resource.loc).st_ino == inode  # appended in place
+
+
+def test_Partitioned(tmpdir):
+    events = resources.Pickle(name='events', loc=os.path.join(str(tmpdir), 'day={day:02d}', 'events.pkl'))
+    for day in [1, 2, 5]:
+        events._save([day], {'day': day})
+    os.makedirs(os.path.join(str(tmpdir), 'day=03'))  # an empty partition directory
+    partitioned = resources.Partitioned(events, 'day')
+    assert sorted(partitioned.scan({})) == ['01', '02', '05']
+    assert partitioned.missing(range(1, 6), {}) == [3, 4]
+    assert partitioned._load({}) == [[1], [2], [5]]
+    selected = resources.Partitioned(events, 'day', values=lambda context: [2, 5],
+                                     combine=lambda parts: sum(parts, []))
+    assert selected._check({}) and selected._load({}) == [2, 5]
+    assert resources.Partitioned(events, 'day', values=lambda context: range(1, 5))._missing({}) == [
+        {'day': 3}, {'day': 4}]
+
+
+def test_LocalFileMixin_discover(tmpdir):
+    resource = resources.Pickle(name='model', loc=os.path.join(str(tmpdir), '{name}', '{name}_{version}.pkl'))
+    for name, version in [('a', 1), ('b', 2)]:
+        resource._save(version, {'name': name, 'version': version})
+    os.rename(os.path.join(str(tmpdir), 'b', 'b_2.pkl'), os.path.join(str(tmpdir), 'b', 'a_2.pkl'))
+    assert resource.discover() == [os.path.join(str(tmpdir), 'a', 'a_1.pkl')]
+
+
+def test_recorded_assertions(tmpdir):
+    pd = pytest.importorskip('pandas')
+    calls = []
+
+    def expensive(df):
+        calls.append('expensive')
+        assertions.none_null(df)
+
+    @assertions.cheap
+    def schema(df):
+        calls.append('schema')
+
+    resource = resources.PandasCSV(name='df', loc=os.path.join(str(tmpdir), 'df.csv'), columns=['a'],
+                                   assertions=[expensive, schema,
+                                               assertions.sampled(assertions.between('a', 0, 9), n=5)])
+    resource._save(pd.DataFrame({'a': range(10)}), {})
+    assert calls == ['expensive', 'schema']
+    calls.clear()
+    resource._load({})
+    assert calls == ['schema']  # passed for the unchanged content
+    calls.clear()
+    resource._load({'assertions': 'recorded'})
+    assert calls == []
+    resource._load({'assertions': 'strict'})
+    assert calls == ['expensive', 'schema']
+    calls.clear()
+    os.utime(resource.loc, (0, 0))  # a changed stamp, but identical content
+    resource._load({})
+    assert calls == ['schema']
+    calls.clear()
+    pd.DataFrame({'a': [1, None]}).to_csv(resource.loc, index=False)  # changed outside of the pipeline
+    with pytest.raises(AssertionError):
+        resource._load({})
+    assert calls == ['expensive']
+
+
+def test_recorded_cheap_assertions_skip_content_hash(tmpdir, monkeypatch):
+    hashed = []
+    stamp = resources.Pickle.stamp
+
+    def counting_stamp(self, path, content=False):
+        if content:
+            hashed.append(path)
+        return stamp(self, path, content=content)
+
+    @assertions.cheap
+    def positive(data):
+        assert all(_ > 0 for _ in data)
+
+    monkeypatch.setattr(resources.Pickle, 'stamp', counting_stamp)
+    resource = resources.Pickle(name='data', loc=os.path.join(str(tmpdir), 'data.pkl'), assertions=[positive])
+    resource._save([1], {})
+    assert not hashed
+    assert resource.read_meta(resource.loc)['assertions']['content'] is None
+    os.utime(resource.loc, (0, 0))
+    assert resource._passed_assertions(resource.loc) == set() and not hashed
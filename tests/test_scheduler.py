@@ -0,0 +1,64 @@
+import threading
+import time
+
+from dalymi import Pipeline
+from dalymi.scheduler import Scheduler
+
+
+class Recorder:
+    ''' Creates jobs which record their order and the maximum number of jobs running at the same time. '''
+
+    def __init__(self):
+        self.order = []
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def job(self, name):
+        def func(**context):
+            with self.lock:
+                self.order.append(name)
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            time.sleep(0.05)
+            with self.lock:
+                self.running -= 1
+        func.__name__ = name
+        return func, {}
+
+
+def test_Scheduler_admits_jobs_within_memory_limit():
+    recorder = Recorder()
+    jobs = {_: recorder.job(_) for _ in 'abcd'}
+    requirements = {'a': (6, 1), 'b': (6, 1), 'c': (3, 1), 'd': (30, 1)}
+    Scheduler(workers=4, memory=10).run(jobs, {}, requirements)
+    assert recorder.peak == 2  # only 'c' fits next to 'a' or 'b', 'd' runs alone
+    assert sorted(recorder.order) == list('abcd')
+
+
+def test_Scheduler_prefers_critical_path():
+    dependencies = {'long2': {'long1'}, 'long3': {'long2'}}
+    recorder = Recorder()
+    jobs = {_: recorder.job(_) for _ in ['short', 'long1', 'long2', 'long3']}
+    Scheduler(workers=2, cpus=1).run(jobs, dependencies)
+    assert recorder.order[:2] == ['long1', 'long2']
+    recorder = Recorder()
+    jobs = {_: recorder.job(_) for _ in ['short', 'long1', 'long2', 'long3']}
+    Scheduler(workers=2, cpus=1).run(jobs, dependencies, costs={'short': 10})
+    assert recorder.order[0] == 'short'
+
+
+def test_declared_requirements():
+    pl = Pipeline()
+
+    @pl.output()
+    @pl.input(memory='2G')
+    def heavy(**context):
+        pass
+
+    @pl.output(cpus=4)
+    def parallel(**context):
+        pass
+
+    assert pl.requirements == {'heavy': {'memory': 2 * 2**30}, 'parallel': {'cpus': 4}}
+    pl.run(workers=2, memory='3G', cpus=4)
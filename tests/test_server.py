@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+import io
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+from dalymi import assertions, Pipeline, PipelineCLI
+from dalymi.resources import PandasCSV, Pickle
+from dalymi.server import Server, submit
+
+
+def test_serve(tmpdir, monkeypatch):
+    pl = Pipeline()
+    raw = Pickle(name='raw', loc=os.path.join(str(tmpdir), 'raw.pkl'))
+    total = Pickle(name='total', loc=os.path.join(str(tmpdir), 'total.pkl'))
+
+    @pl.output(raw)
+    def make_raw(**context):
+        return list(range(10))
+
+    @pl.output(total)
+    @pl.input(raw)
+    def make_total(raw, **context):
+        return sum(raw)
+
+    loads = []
+    original_load = Pickle.load
+    monkeypatch.setattr(Pickle, 'load', lambda self, path: loads.append(path) or original_load(self, path))
+    logger = logging.getLogger('dalymi')
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    path = os.path.join(str(tmpdir), 'dalymi.sock')
+    server = Server(PipelineCLI(pl), path)
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    try:
+        while not os.path.exists(path):
+            time.sleep(0.01)
+        out, err = io.StringIO(), io.StringIO()
+        assert submit(['run'], path, out, err) == 0
+        assert 'Attempting to run function <make_total>.' in err.getvalue()
+        assert submit(['undo', '-t', 'make_total'], path, out, err) == 0
+        err = io.StringIO()
+        assert submit(['run', '-t', 'make_total'], path, out, err) == 0
+        assert 'Took <raw> from the warm cache.' in err.getvalue()
+        assert loads == []  # `raw` was kept in memory after saving it
+        assert total._load({}) == 45
+        out = io.StringIO()
+        assert submit(['ls'], path, out, err) == 0
+        assert 'make_total' in out.getvalue()
+        assert submit(['run', '--unknown'], path, out, err) == 2
+    finally:
+        logger.setLevel(level)
+        server.shutdown()
+        thread.join()
+    assert not os.path.exists(path)
+
+
+@contextmanager
+def serving(pl, path):
+    server = Server(PipelineCLI(pl), path)
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    try:
+        while not os.path.exists(path):
+            time.sleep(0.01)
+        yield server
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+def test_serve_hands_out_copies_and_runs_cheap_assertions(tmpdir):
+    pd = pytest.importorskip('pandas')
+    pl = Pipeline()
+    checked = []
+
+    @assertions.cheap
+    def positive(df):
+        checked.append(len(df.columns))
+        assert (df['a'] > 0).all()
+
+    prepared = PandasCSV(name='prepared', loc=os.path.join(str(tmpdir), 'prepared.csv'), columns=['a'],
+                         assertions=[positive])
+    clusters = PandasCSV(name='clusters', loc=os.path.join(str(tmpdir), 'clusters.csv'), columns=['a', 'cluster'])
+
+    @pl.output(prepared)
+    def prepare(**context):
+        return pd.DataFrame({'a': [1, 2]})
+
+    @pl.output(clusters)
+    @pl.input(prepared)
+    def predict_clusters(prepared, **context):
+        prepared['cluster'] = 0  # changes the input in place
+        return prepared
+
+    path = os.path.join(str(tmpdir), 'dalymi.sock')
+    with serving(pl, path):
+        out, err = io.StringIO(), io.StringIO()
+        assert submit(['run'], path, out, err) == 0
+        assert submit(['undo', '-t', 'predict_clusters'], path, out, err) == 0
+        del checked[:]
+        assert submit(['run', '-t', 'predict_clusters'], path, out, err) == 0, err.getvalue()
+        assert checked == [1]  # the warm input has its original columns and was checked
+    assert clusters._load({}).columns.tolist() == ['a', 'cluster']
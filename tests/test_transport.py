@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from dalymi import Pipeline
+from dalymi.resources import Pickle
+from dalymi import transport
+from dalymi.transport import SharedMemoryTransport
+
+
+pytestmark = pytest.mark.skipif(not transport.AVAILABLE, reason='requires Python >= 3.8')
+
+# tasks run on the process backend have to be defined at module level:
+pl = Pipeline()
+array = Pickle(name='array', loc='{directory}/array.pkl')
+attached = Pickle(name='attached', loc='{directory}/attached.pkl')
+
+
+@pl.output(array)
+def make_array(**context):
+    import numpy as np
+    return np.arange(10**6)
+
+
+@pl.output(attached)
+@pl.input(array)
+def sum_array(array, directory, **context):
+    return {'total': int(array.sum()), 'segments': len(pl._transport._attached) if pl._transport else 0}
+
+
+def segments():
+    return [_ for _ in os.listdir('/dev/shm') if _.startswith('dalymi-')] if os.path.isdir('/dev/shm') else []
+
+
+def test_SharedMemoryTransport():
+    np = pytest.importorskip('numpy')
+    sender, receiver = SharedMemoryTransport('run'), SharedMemoryTransport('run')
+    assert not sender.put('small', 42)  # nothing to share without buffers
+    assert sender.put('array', np.arange(100))
+    assert not sender.put('array', np.arange(100))
+    data = receiver.get('array')
+    assert (data == np.arange(100)).all()
+    with pytest.raises(KeyError):
+        receiver.get('small')
+    receiver.release()  # `data` still refers to the segment
+    assert receiver._attached
+    del data
+    receiver.release()
+    assert not receiver._attached
+    sender.unlink('array')
+    with pytest.raises(KeyError):
+        receiver.get('array')
+
+
+def test_run_hands_over_in_shared_memory(tmpdir):
+    pytest.importorskip('numpy')
+    before = segments()
+    pl.run(workers=2, backend='process', shared_memory=True, directory=str(tmpdir))
+    result = attached._load({'directory': str(tmpdir)})
+    assert result == {'total': sum(range(10**6)), 'segments': 1}
+    assert segments() == before  # all segments unlinked
@@ -0,0 +1,6 @@
+from dalymi.utils import parse_grid
+
+
+def test_parse_grid():
+    assert parse_grid(['clusters=2..4', 'metric=l1,l2']) == {'clusters': [2, 3, 4], 'metric': ['l1', 'l2']}
+    assert parse_grid(['execution-date=1,2'], types={'execution_date': int}) == {'execution_date': [1, 2]}